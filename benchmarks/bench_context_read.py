@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark serial vs thread-pool file reading for /context.
+
+Builds a synthetic tree of small text files and times utils.workspace.read_files
+with one worker (the old serial path) against a thread pool. Use --latency-ms
+to add a per-open delay that approximates a network-mounted or cold disk.
+
+  python benchmarks/bench_context_read.py --files 10000 --workers 8 --latency-ms 1
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import builtins
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import workspace
+
+
+def build_tree(root, count):
+    paths = []
+    for i in range(count):
+        d = os.path.join(root, f"pkg{i // 100:03d}")
+        os.makedirs(d, exist_ok=True)
+        path = os.path.join(d, f"module_{i:05d}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"def func_{i}():\n    return {i}\n" * 20)
+        paths.append(path)
+    return paths
+
+
+def timed(paths, workers):
+    start = time.perf_counter()
+    contents = workspace.read_files(paths, workers=workers)
+    return time.perf_counter() - start, contents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.latency_ms:
+        real_open = builtins.open
+
+        def slow_open(*a, **kw):
+            time.sleep(args.latency_ms / 1000)
+            return real_open(*a, **kw)
+
+        workspace.open = slow_open
+
+    root = tempfile.mkdtemp(prefix="llm_code_bench_")
+    try:
+        paths = build_tree(root, args.files)
+        serial, expected = timed(paths, 1)
+        pooled, contents = timed(paths, args.workers)
+        assert contents == expected, "thread-pool output differs from serial output"
+        print(f"files:     {args.files}")
+        print(f"latency:   {args.latency_ms} ms/open")
+        print(f"serial:    {serial:.3f}s")
+        print(f"{args.workers} workers: {pooled:.3f}s")
+        print(f"speedup:   {serial / pooled:.2f}x")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
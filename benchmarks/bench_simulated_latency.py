@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark reply latency against the debug-mode simulator, with and without hedging.
+
+Runs requests one after another through the same path as call_api
+(stream_chat into a StreamRenderer, wrapped in call_with_retries, and
+optionally hedged) against utils.simulator.SimulatedClient, and reports
+time to first token and total time. No network access is needed, and a
+fixed --seed gives the same delays on every run.
+
+  python benchmarks/bench_simulated_latency.py --requests 100 --jitter 0.8 --hedge-delay 0.5
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.api_client import stream_chat
+from utils.batch import percentile
+from utils.hedging import hedged
+from utils.render import StreamRenderer
+from utils.resilience import RetryPolicy, call_with_retries
+from utils.simulator import SIMULATOR_OPTIONS, SimulatedClient
+
+MESSAGES = [{"role": "user", "content": "Explain this function."}]
+
+
+async def run(args, hedge_delay):
+    settings = dict(
+        SIMULATOR_OPTIONS,
+        simTtft=args.ttft,
+        simTokensPerSecond=args.tps,
+        simJitter=args.jitter,
+        simOutputTokens=args.tokens,
+        simErrorRate=args.error_rate,
+        simSeed=args.seed,
+    )
+    client = SimulatedClient(settings)
+    policy = RetryPolicy(retries=3, base_delay=0.05)
+    loop = asyncio.get_running_loop()
+    ttfts, totals, fired, failed = [], [], 0, 0
+    with open(os.devnull, "w") as out:
+        for _ in range(args.requests):
+            renderer = StreamRenderer(out, buffered=True)
+            start = loop.time()
+            first = []
+
+            def write(text):
+                if not first:
+                    first.append(loop.time() - start)
+                renderer.write(text)
+
+            def request(on_delta):
+                return stream_chat(client, on_delta, model="sim", messages=MESSAGES)
+
+            def attempt():
+                if hedge_delay is None:
+                    return request(write)
+                return hedged(request, request, write, hedge_delay)
+
+            try:
+                result = await call_with_retries(attempt, policy)
+            except Exception:
+                failed += 1
+                continue
+            if hedge_delay is not None and result[1]["hedged"]:
+                fired += 1
+            renderer.finish()
+            ttfts.append(first[0] if first else loop.time() - start)
+            totals.append(loop.time() - start)
+    return ttfts, totals, fired, failed
+
+
+def report(label, ttfts, totals, failed):
+    if not ttfts:
+        print(f"{label:<10} all {failed} request(s) failed")
+        return
+    print(f"{label:<10} {failed} failed  TTFT p50 {percentile(ttfts, 50):.3f}s  p90 {percentile(ttfts, 90):.3f}s  "
+          f"p99 {percentile(ttfts, 99):.3f}s  total p50 {percentile(totals, 50):.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tps", type=float, default=200.0, help="tokens per second (0 for no delay)")
+    parser.add_argument("--jitter", type=float, default=0.6, help="sigma of the lognormal delay factor")
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hedge-delay", type=float, help="also run with hedging after this many seconds")
+    args = parser.parse_args()
+
+    ttfts, totals, _, failed = asyncio.run(run(args, None))
+    report("plain", ttfts, totals, failed)
+    if args.hedge_delay is not None:
+        ttfts, totals, fired, failed = asyncio.run(run(args, args.hedge_delay))
+        report("hedged", ttfts, totals, failed)
+        print(f"hedges fired for {fired} of {args.requests} request(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-delta printing vs the frame-coalesced StreamRenderer.
+
+Feeds a fake stream of small deltas (as a model reply arrives) through the
+old call_api loop (print + flush per delta, string +=) and through
+utils.render.StreamRenderer, counting terminal writes. Output goes to
+/dev/null, or to a pseudo-terminal drained by a reader thread with --tty.
+
+  python benchmarks/bench_stream_render.py --chunks 50000 --tty
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.render import StreamRenderer
+
+
+def fake_stream(count, seed=0):
+    rng = random.Random(seed)
+    words = ["def", " return", " self", ".", "(", ")", " value", "\n", "    ", " if", " not", " None", ":"]
+    return [rng.choice(words) for _ in range(count)]
+
+
+def open_output(tty):
+    if not tty:
+        return open(os.devnull, "w"), None
+    master, slave = os.openpty()
+
+    def drain():
+        try:
+            while os.read(master, 65536):
+                pass
+        except OSError:
+            pass
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    return os.fdopen(slave, "w"), master
+
+
+def old_loop(chunks, out):
+    full_response = ""
+    for content in chunks:
+        print(content, end="", flush=True, file=out)
+        full_response += content
+    return full_response, len(chunks)
+
+
+def renderer_loop(chunks, out):
+    renderer = StreamRenderer(out, buffered=True)
+    for content in chunks:
+        renderer.write(content)
+    return renderer.finish(), renderer.writes
+
+
+def timed(loop, chunks, tty):
+    out, master = open_output(tty)
+    try:
+        start = time.perf_counter()
+        text, writes = loop(chunks, out)
+        return time.perf_counter() - start, text, writes
+    finally:
+        out.close()
+        if master is not None:
+            os.close(master)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--tty", action="store_true", help="write to a pseudo-terminal instead of /dev/null")
+    args = parser.parse_args()
+
+    chunks = fake_stream(args.chunks)
+    old, expected, old_writes = timed(old_loop, chunks, args.tty)
+    new, text, new_writes = timed(renderer_loop, chunks, args.tty)
+    assert text == expected, "renderer output differs from the per-delta loop"
+    print(f"chunks:    {args.chunks} ({len(expected)} chars)")
+    print(f"output:    {'pty' if args.tty else os.devnull}")
+    print(f"per-delta: {old:.3f}s, {old_writes} writes")
+    print(f"renderer:  {new:.3f}s, {new_writes} writes")
+    print(f"speedup:   {old / new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Check that the connection warm-up is reused by the first request.
+
+Starts benchmarks/fake_openai_server.py on a free port, warms up a
+ClientPool the way prewarmConnection does, then streams one reply through
+stream_chat and counts the TCP connections the server accepted. One
+connection means the request reused the pre-warmed one. Exits non-zero on
+failure.
+
+  python benchmarks/check_prewarm.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from utils.api_client import CLIENT_OPTIONS, ApiLoop, ClientPool, stream_chat
+
+
+def main():
+    server = FakeOpenAIServer().start()
+    api_loop = ApiLoop()
+    pool = ClientPool(api_loop)
+    settings = dict(CLIENT_OPTIONS, apiKey="sk-test", baseUrl=server.base_url)
+    try:
+        warm = pool.warm_up("default", settings, timeout=5)
+        parts = []
+        start = time.perf_counter()
+        api_loop.run(stream_chat(pool.get("default", settings), parts.append,
+                                 model="fake", messages=[{"role": "user", "content": "hi"}]))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
+        server.stop()
+    print(f"warm-up:     {warm * 1000:.1f} ms")
+    print(f"first reply: {elapsed * 1000:.1f} ms, {len(parts)} deltas")
+    print(f"connections: {server.connections} for {server.requests} request(s) plus the warm-up")
+    ok = server.connections == 1 and len(parts) == server.chunks
+    print("PASS" if ok else "FAIL: the first request opened its own connection")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
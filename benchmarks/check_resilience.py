@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Check the retry layer and circuit breaker against a server that injects failures.
+
+Each scenario starts benchmarks/fake_openai_server.py with a failure plan
+and streams one reply through call_with_retries(stream_chat(...)), as
+call_api does, then checks the outcome and how many requests reached the
+server. Exits non-zero if any scenario fails.
+
+  python benchmarks/check_resilience.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from utils.api_client import CLIENT_OPTIONS, build_client, stream_chat
+from utils.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retries
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+async def request(server, policy, breaker=None):
+    """Stream one reply; returns (text, error, seconds)."""
+    client, _ = build_client(dict(CLIENT_OPTIONS, apiKey="sk-test", baseUrl=server.base_url), use_async=True)
+    parts = []
+    start = time.perf_counter()
+    try:
+        await call_with_retries(
+            lambda: stream_chat(client, parts.append, model="fake", messages=MESSAGES),
+            policy, breaker, emitted=lambda: bool(parts)
+        )
+        error = None
+    except Exception as e:
+        error = e
+    finally:
+        await client.close()
+    return "".join(parts), error, time.perf_counter() - start
+
+
+async def retry_after():
+    server = FakeOpenAIServer(plan=["429"], retry_after=1).start()
+    text, error, seconds = await request(server, RetryPolicy(retries=2, base_delay=0.01))
+    server.stop()
+    return error is None and text and server.requests == 2 and seconds >= 1, \
+        f"{server.requests} requests, {seconds:.2f}s (Retry-After: 1)"
+
+
+async def server_errors():
+    server = FakeOpenAIServer(plan=["503", "503"]).start()
+    text, error, seconds = await request(server, RetryPolicy(retries=3, base_delay=0.01))
+    server.stop()
+    return error is None and text and server.requests == 3, f"{server.requests} requests, {seconds:.2f}s"
+
+
+async def dropped_connection():
+    server = FakeOpenAIServer(plan=["drop"]).start()
+    text, error, _ = await request(server, RetryPolicy(retries=2, base_delay=0.01))
+    server.stop()
+    return error is None and text and server.requests == 2, f"{server.requests} requests, error={error!r}"
+
+
+async def mid_stream_drop():
+    # Part of the reply was delivered, so retrying would repeat it
+    server = FakeOpenAIServer(plan=["cut"]).start()
+    text, error, _ = await request(server, RetryPolicy(retries=2, base_delay=0.01))
+    server.stop()
+    return error is not None and text == "tok0 tok1 " and server.requests == 1, \
+        f"{server.requests} request(s), partial={text!r}, error={type(error).__name__}"
+
+
+async def client_error():
+    server = FakeOpenAIServer(plan=["400"]).start()
+    _, error, _ = await request(server, RetryPolicy(retries=2, base_delay=0.01))
+    server.stop()
+    return getattr(error, "status_code", None) == 400 and server.requests == 1, f"{server.requests} request(s)"
+
+
+async def circuit_breaker():
+    server = FakeOpenAIServer(plan=["503"] * 10).start()
+    breaker = CircuitBreaker(threshold=2, cooldown=0.5)
+    policy = RetryPolicy(retries=0)
+    for _ in range(2):
+        await request(server, policy, breaker)
+    _, error, _ = await request(server, policy, breaker)
+    failed_fast = isinstance(error, CircuitOpenError) and server.requests == 2
+    await asyncio.sleep(0.6)
+    server.plan.clear()
+    text, error, _ = await request(server, policy, breaker)
+    server.stop()
+    return failed_fast and error is None and text and breaker.state == "closed", \
+        f"{server.requests} requests, state after trial: {breaker.state}"
+
+
+SCENARIOS = [
+    ("429 with Retry-After is retried after the hinted delay", retry_after),
+    ("503s are retried until a reply arrives", server_errors),
+    ("a dropped connection is retried", dropped_connection),
+    ("a stream cut part-way keeps the partial reply and is not retried", mid_stream_drop),
+    ("400 is not retried", client_error),
+    ("the breaker fails fast when open and closes after a good trial", circuit_breaker),
+]
+
+
+def main():
+    failures = 0
+    for description, scenario in SCENARIOS:
+        ok, detail = asyncio.run(scenario())
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {description} ({detail})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+A local OpenAI-compatible chat completions server for checks and benchmarks.
+
+Streams `chunks` SSE deltas per request (with a usage chunk when the client
+asks for one), answers non-streaming requests with a JSON completion and
+HEAD requests (the connection warm-up) with 404. Counts the TCP
+connections and requests it has served, so callers can check connection
+reuse.
+
+Failures are injected from a plan, one step per chat request; once the
+plan runs out every request succeeds:
+  ok     a normal reply
+  429    rate limited, with Retry-After (--retry-after seconds)
+  500, 503, 400 ...  an error response with that status
+  drop   close the connection without responding
+  cut    stream two deltas, then drop the connection
+
+  python benchmarks/fake_openai_server.py --port 8765 --chunks 20 --delay 0.01
+  python benchmarks/fake_openai_server.py --plan 429,503,cut,drop --retry-after 1
+
+Point the client at it with /config set baseUrl http://127.0.0.1:8765/v1.
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        with self.server.lock:
+            self.server.connections += 1
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests += 1
+            step = self.server.plan.pop(0) if self.server.plan else "ok"
+        if step == "drop":
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        if step == "cut":
+            self._stream(body, max(self.server.chunks, 3), cut_after=2)
+            return
+        if step != "ok":
+            status = int(step)
+            headers = [("Retry-After", str(self.server.retry_after))] if status == 429 else []
+            self._send_json(status, {"error": {"message": f"injected {status}", "type": "fake"}}, headers)
+            return
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "fake reply"}}],
+            })
+            return
+        self._stream(body, self.server.chunks)
+
+    def _send_json(self, status, payload, headers=()):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, payload):
+        data = ("data: " + (payload if isinstance(payload, str) else json.dumps(payload)) + "\n\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _stream(self, body, chunks, cut_after=None):
+        """Stream `chunks` deltas; with `cut_after`, drop the connection after that many instead."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i in range(chunks):
+                if i == cut_after:
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+                self._write_chunk({
+                    "id": "fake", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": f"tok{i} "}, "finish_reason": None}],
+                })
+                if self.server.delay:
+                    time.sleep(self.server.delay)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                prompt_tokens = len(json.dumps(body["messages"])) // 4
+                self._write_chunk({
+                    "id": "fake", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                    "choices": [],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": chunks,
+                              "total_tokens": prompt_tokens + chunks},
+                })
+            self._write_chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """The server, run on a background thread with start() and shut down with stop()."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, chunks=5, delay=0.0, plan=(), retry_after=1, handler=Handler):
+        super().__init__(("127.0.0.1", port), handler)
+        self.chunks = chunks
+        self.delay = delay
+        self.plan = list(plan)
+        self.retry_after = retry_after
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-openai-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chunks", type=int, default=5, help="deltas streamed per reply")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds between deltas")
+    parser.add_argument("--plan", default="", help="comma-separated failure steps, e.g. 429,503,cut")
+    parser.add_argument("--retry-after", default="1", help="Retry-After value sent with 429")
+    args = parser.parse_args()
+    plan = [step for step in args.plan.split(",") if step]
+    server = FakeOpenAIServer(args.port, args.chunks, args.delay, plan, args.retry_after)
+    print(f"Serving on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -25,12 +25,37 @@ Before you begin:
 """
 
 import os
+import re
 import sys
 import json
 import time
-import openai
+import shlex
+import asyncio
+import argparse
+import threading
 import traceback
-import fnmatch
+
+from utils.api_client import CLIENT_OPTIONS, ApiLoop, ClientPool, stream_chat
+from utils.batch import run_batch
+from utils.bm25 import open_index as open_bm25_index
+from utils.compaction import SUMMARY_PROMPT, Compactor
+from utils.context_delta import ContextTracker
+from utils.conversation import conversation_tokens, describe, fit_to_budget, message_tokens
+from utils.context_pack import file_block, pack_context
+from utils.git_index import read_git_index
+from utils.gitignore import IgnoreMatcher, compile_patterns, find_ignore_root
+from utils.hedging import TtftTracker, hedged
+from utils.prompt_layout import assemble, cached_tokens
+from utils.render import StreamRenderer
+from utils.repo_map import build_repo_map, outline_files
+from utils.resilience import CircuitBreaker, RetryPolicy, call_with_retries
+from utils.response_cache import open_response_cache, request_key
+from utils.simulator import SIMULATOR_OPTIONS, SimulatedClient
+from utils.tokens import estimate_tokens
+from utils.trigram import open_index as open_trigram_index
+from utils.watcher import start_watcher
+from utils.workspace import iter_read_files, read_files, read_text_file, walk_tree
+from utils.workspace_cache import open_workspace_cache
 
 # ANSI color codes for colored terminal output
 class Color:
@@ -73,7 +98,60 @@ DEFAULT_CONFIG = {
             "apiKey": "",
             "baseUrl": "https://api.openai.com/v1",
             "model": "gpt-4o",
-            "debug": False
+            "debug": False,
+            "simTtft": 0.5,
+            "simTokensPerSecond": 50.0,
+            "simJitter": 0.2,
+            "simOutputTokens": 200,
+            "simErrorRate": 0.0,
+            "simDropRate": 0.0,
+            "simSeed": 0,
+            "contextCache": True,
+            "contextWorkers": 1,
+            "contextGitIndex": False,
+            "maxFileBytes": 1048576,
+            "contextTokenBudget": 32000,
+            "contextStreaming": False,
+            "watchWorkspace": False,
+            "watchPollInterval": 2.0,
+            "contextMode": "full",
+            "autoRetrieve": False,
+            "retrieveTopK": 5,
+            "retrieveTokenBudget": 4000,
+            "grepMaxResults": 500,
+            "grepAddToContext": False,
+            "requestTimeout": 600.0,
+            "connectTimeout": 10.0,
+            "maxConnections": 10,
+            "maxKeepaliveConnections": 5,
+            "keepaliveExpiry": 30.0,
+            "maxRetries": 3,
+            "retryBaseDelay": 0.5,
+            "retryMaxDelay": 30.0,
+            "retryBudget": 60.0,
+            "circuitBreakerThreshold": 5,
+            "circuitBreakerCooldown": 30.0,
+            "hedgeRequests": False,
+            "hedgeDelay": 0.0,
+            "hedgeProfile": "",
+            "prewarmConnection": False,
+            "prewarmTimeout": 5.0,
+            "logTimings": False,
+            "temperature": 0.7,
+            "responseCache": False,
+            "responseCacheMaxBytes": 52428800,
+            "cacheSampledResponses": False,
+            "contextWindowTokens": 128000,
+            "replyTokenReserve": 4096,
+            "evictionPolicy": "stale-first",
+            "keepLastExchanges": 4,
+            "autoCompact": False,
+            "compactThreshold": 0.75,
+            "compactionModel": "gpt-4o-mini",
+            "batchWorkers": 8,
+            "batchRequestsPerMinute": 0,
+            "batchTokensPerMinute": 0,
+            "batchRetries": 2
         }
     },
     "active": "default"
@@ -106,6 +184,19 @@ def get_active_config():
     active = config.get("active", "default")
     return config.get("configs", {}).get(active, {})
 
+def get_config_option(key, default, profile=None):
+    """Read an active (or `profile`'s) config value, coercing strings set via /config set to the default's type."""
+    options = config.get("configs", {}).get(profile, {}) if profile else get_active_config()
+    value = options.get(key, default)
+    if isinstance(value, str) and not isinstance(default, str):
+        if isinstance(default, bool):
+            return value.strip().lower() in ("1", "true", "yes", "on")
+        try:
+            return type(default)(value)
+        except (TypeError, ValueError):
+            return default
+    return value
+
 def set_active_config(key, value):
     active = config.get("active", "default")
     if active in config.get("configs", {}):
@@ -119,33 +210,32 @@ def set_active_config(key, value):
 # File System Operations
 # ----------------------------
 
+# Always skipped on top of .gitignore rules (which may re-include them with "!")
+CONTEXT_IGNORE_PATTERNS = [".git", "*.pyc", ".env*", "__pycache__/"]
+TREE_IGNORE_PATTERNS = [".*", "__pycache__/", "node_modules/"]
+
 def get_current_dir():
     return os.getcwd()
 
-def print_tree(path, prefix="", is_last=True):
+def print_tree(path):
     """Print directory structure in tree format."""
     try:
         full_path = os.path.abspath(os.path.join(os.getcwd(), path))
         base_name = os.path.basename(full_path)
-        
-        # Print current node
-        connector = "└── " if is_last else "├── "
-        print(f"{prefix}{connector}{Color.blue(base_name) if os.path.isdir(full_path) else base_name}")
-        
-        # If it's a directory, process its contents
-        if os.path.isdir(full_path):
-            entries = os.listdir(full_path)
-            entries.sort(key=lambda x: (not os.path.isdir(os.path.join(full_path, x)), x.lower()))
-            
-            for i, entry in enumerate(entries):
-                entry_path = os.path.join(full_path, entry)
-                # Skip hidden files and common ignore patterns
-                if entry.startswith('.') or entry in ['__pycache__', 'node_modules']:
-                    continue
-                    
-                is_last_entry = i == len(entries) - 1
-                new_prefix = prefix + ("    " if is_last else "│   ")
-                print_tree(os.path.join(path, entry), new_prefix, is_last_entry)
+        is_dir = os.path.isdir(full_path)
+        print(f"└── {Color.blue(base_name) if is_dir else base_name}")
+        if not is_dir:
+            return
+
+        # Skip hidden files, common ignore patterns and anything gitignored
+        matcher = IgnoreMatcher(find_ignore_root(full_path), TREE_IGNORE_PATTERNS)
+        ancestors_last = []
+        for item in walk_tree(full_path, matcher):
+            del ancestors_last[item.depth:]
+            prefix = "    " + "".join("    " if last else "│   " for last in ancestors_last)
+            connector = "└── " if item.is_last else "├── "
+            print(f"{prefix}{connector}{Color.blue(item.name) if item.is_dir else item.name}")
+            ancestors_last.append(item.is_last)
                 
     except Exception as e:
         print(Color.red(f"Error accessing {path}: {str(e)}"))
@@ -153,20 +243,25 @@ def print_tree(path, prefix="", is_last=True):
 def list_directory(dir_path="."):
     try:
         full_path = os.path.abspath(os.path.join(os.getcwd(), dir_path))
-        entries = os.listdir(full_path)
+        if not os.path.isdir(full_path):
+            return {"success": False, "error": f"{full_path} is not a directory"}
+        matcher = IgnoreMatcher(find_ignore_root(full_path))
+        dir_ignored = matcher.is_path_ignored(full_path, True)
+        rel_dir = matcher.relpath(full_path)
+        rel_prefix = None if rel_dir.startswith("..") else (rel_dir + "/" if rel_dir else "")
         files = []
-        for entry in entries:
-            entry_path = os.path.join(full_path, entry)
+        for item in walk_tree(full_path, max_depth=0):
             try:
-                stat = os.stat(entry_path)
+                stat = item.entry.stat()
                 files.append({
-                    "name": entry,
-                    "isDirectory": os.path.isdir(entry_path),
+                    "name": item.name,
+                    "isDirectory": item.is_dir,
+                    "ignored": dir_ignored or (rel_prefix is not None and matcher.is_ignored(rel_prefix + item.name, item.is_dir)),
                     "size": stat.st_size,
                     "modified": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(stat.st_mtime))
                 })
             except Exception as e:
-                files.append({"name": entry, "error": str(e)})
+                files.append({"name": item.name, "error": str(e)})
         return {"success": True, "path": full_path, "files": files}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -192,8 +287,11 @@ def make_directory(dir_path):
 def read_file(file_path):
     try:
         full_path = os.path.abspath(os.path.join(os.getcwd(), file_path))
-        with open(full_path, "r", encoding="utf-8") as f:
-            content = f.read()
+        if not os.path.isfile(full_path):
+            return {"success": False, "error": f"{full_path} is not a file"}
+        content, reason = read_text_file(full_path, get_config_option("maxFileBytes", 1048576))
+        if content is None:
+            return {"success": False, "error": f"Cannot read file: {reason}"}
         return {"success": True, "path": full_path, "content": content}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -210,66 +308,277 @@ def write_file(file_path, content):
         return {"success": False, "error": str(e)}
 
 # Add after the file system operations section
-def get_workspace_context(path="."):
-    """Get context from files in the workspace."""
+def list_tracked_files(root, full_path):
+    """List (file_path, rel_path) pairs for git-tracked files under full_path, or None if root has no usable index.
+
+    Tracked files deleted from the work tree (but not yet from the index) are left out.
+    """
+    entries = read_git_index(root)
+    if entries is None:
+        return None
+    defaults = compile_patterns(CONTEXT_IGNORE_PATTERNS)
+    rel_base = os.path.relpath(full_path, root).replace(os.sep, "/")
+    prefix = "" if rel_base == "." else rel_base + "/"
+    skipped_dirs = {}
+    candidates = []
+    for entry in entries:
+        if not entry.path.startswith(prefix) or defaults.matches(entry.path):
+            continue
+        rel_dir = entry.path.rpartition("/")[0]
+        if rel_dir not in skipped_dirs:
+            parts = rel_dir.split("/") if rel_dir else []
+            skipped_dirs[rel_dir] = any(
+                defaults.matches("/".join(parts[:i]) + "/") for i in range(1, len(parts) + 1)
+            )
+        if skipped_dirs[rel_dir]:
+            continue
+        rel_path = entry.path[len(prefix):].replace("/", os.sep)
+        file_path = os.path.join(full_path, rel_path)
+        if not os.path.isfile(file_path):
+            continue
+        candidates.append((file_path, rel_path))
+    return candidates
+
+def list_workspace_files(full_path, matcher=None):
+    """List (file_path, rel_path) pairs for the files /context would read under the directory full_path."""
+    if matcher is None:
+        matcher = IgnoreMatcher(find_ignore_root(full_path), CONTEXT_IGNORE_PATTERNS)
+    candidates = None
+    if get_config_option("contextGitIndex", False):
+        candidates = list_tracked_files(matcher.root, full_path)
+    if candidates is None:
+        candidates = [
+            (item.path, item.rel_path)
+            for item in walk_tree(full_path, matcher) if not item.is_dir
+        ]
+    return candidates
+
+def iter_workspace_context(path=".", max_bytes=None, max_tokens=None):
+    """Yield workspace files under path one at a time, in walk order.
+
+    Yields {"path", "content"} dicts for files read and {"path", "reason"}
+    dicts for files skipped. Files are read in small batches, so memory
+    stays proportional to the largest batch rather than the whole tree.
+    Once the content yielded would exceed max_bytes or max_tokens, the
+    remaining files are yielded as skipped without being read.
+    """
+    full_path = os.path.abspath(os.path.join(os.getcwd(), path))
+    used_bytes = used_tokens = 0
+    over_budget = False
+
+    def budgeted(rel_path, content):
+        nonlocal used_bytes, used_tokens, over_budget
+        if content is None or over_budget:
+            return content
+        size = len(content)
+        tokens = estimate_tokens(file_block(rel_path, content))
+        if (max_bytes and used_bytes + size > max_bytes) or (max_tokens and used_tokens + tokens > max_tokens):
+            over_budget = True
+            return None
+        used_bytes += size
+        used_tokens += tokens
+        return content
+
+    if workspace_watcher and os.path.isdir(full_path):
+        snapshot = workspace_watcher.snapshot(full_path)
+        if snapshot is not None:
+            context, skipped = snapshot
+            for file in context:
+                if budgeted(file["path"], file["content"]) is None:
+                    yield {"path": file["path"], "reason": "context budget reached"}
+                else:
+                    yield file
+            yield from skipped
+            return
+
+    matcher = IgnoreMatcher(find_ignore_root(full_path), CONTEXT_IGNORE_PATTERNS)
+    cache = None
     try:
-        ignore_patterns = []
-        gitignore_path = os.path.join(os.getcwd(), '.gitignore')
-        if os.path.exists(gitignore_path):
-            with open(gitignore_path, 'r') as f:
-                ignore_patterns = [
-                    line.strip().replace('/', os.sep) for line in f 
-                    if line.strip() and not line.startswith('#')
-                ]
-
-        context = []
-        full_path = os.path.abspath(os.path.join(os.getcwd(), path))
+        if get_config_option("contextCache", True):
+            ignore_text = ""
+            gitignore_path = os.path.join(matcher.root, '.gitignore')
+            if os.path.exists(gitignore_path):
+                with open(gitignore_path, 'r') as f:
+                    ignore_text = f.read()
+            cache = open_workspace_cache(matcher.root, ignore_text)
 
+        file_max_bytes = get_config_option("maxFileBytes", 1048576)
         if os.path.isfile(full_path):
-            try:
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                context.append({
-                    "path": os.path.basename(full_path),
-                    "content": content
-                })
-                return {"success": True, "context": context}
-            except (UnicodeDecodeError, IOError):
-                return {"success": False, "error": "Cannot read file: binary or unreadable"}
-
-        for root, dirs, files in os.walk(full_path):
-            rel_root = os.path.relpath(root, full_path)
-            dirs[:] = [d for d in dirs if not any(
-                fnmatch.fnmatch(os.path.join(rel_root, d), p) or
-                fnmatch.fnmatch(d, p.rstrip(os.sep))
-                for p in ignore_patterns
-            )]
-            
-            for file in files:
-                rel_path = os.path.join(rel_root, file)
-                if any(fnmatch.fnmatch(rel_path, p) for p in ignore_patterns) or \
-                   any(fnmatch.fnmatch(file, p.rstrip(os.sep)) for p in ignore_patterns) or \
-                   any(pattern in file.lower() for pattern in ['.git', '.pyc', '.env', '__pycache__']):
-                    continue
-                
-                file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, path)
-                
-                if any(any(fnmatch.fnmatch(part, p) for p in ignore_patterns) 
-                       for part in rel_path.split(os.sep)):
-                    continue
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    context.append({"path": rel_path, "content": content})
-                except (UnicodeDecodeError, IOError):
-                    continue
-                    
-        return {"success": True, "context": context}
+            content, reason = read_files([full_path], cache, max_bytes=file_max_bytes)[0]
+            if content is None:
+                raise ValueError(f"Cannot read file: {reason}")
+            yield {"path": os.path.basename(full_path), "content": content}
+            return
+
+        candidates = list_workspace_files(full_path, matcher)
+        file_paths = [file_path for file_path, _ in candidates]
+        results = iter_read_files(file_paths, cache, get_config_option("contextWorkers", 1), file_max_bytes)
+        for _, rel_path in candidates:
+            if over_budget:
+                yield {"path": rel_path, "reason": "context budget reached"}
+                continue
+            content, reason = next(results)
+            if budgeted(rel_path, content) is None and reason is None:
+                reason = "context budget reached"
+            if reason is None:
+                yield {"path": rel_path, "content": content}
+            else:
+                yield {"path": rel_path, "reason": reason}
+
+        if cache:
+            cache.prune(full_path, set(file_paths))
+    finally:
+        if cache:
+            cache.close()
+
+def print_context_file(file):
+    """Print one context file with line numbers."""
+    print(Color.blue(f"\n[{file['path']}]"))
+    print("─" * 80)
+    for i, line in enumerate(file["content"].splitlines(), 1):
+        print(f"{Color.dim(f'{i:4d} │')} {line}")
+    print("─" * 80)
+
+def get_workspace_context(path="."):
+    """Get context from files in the workspace."""
+    try:
+        context, skipped = [], []
+        for item in iter_workspace_context(path):
+            if "content" in item:
+                context.append(item)
+            else:
+                skipped.append(item)
+        return {"success": True, "context": context, "skipped": skipped}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+# Background index of the workspace, kept hot when "watchWorkspace" is enabled
+workspace_watcher = None
+
+def restart_workspace_watcher():
+    """(Re)start the workspace watcher for the current directory if enabled."""
+    global workspace_watcher
+    if workspace_watcher:
+        workspace_watcher.stop()
+        workspace_watcher = None
+    if get_config_option("watchWorkspace", False):
+        root = os.getcwd()
+        workspace_watcher = start_watcher(
+            root,
+            ignore_root=find_ignore_root(root),
+            extra_patterns=CONTEXT_IGNORE_PATTERNS,
+            max_bytes=get_config_option("maxFileBytes", 1048576),
+            workers=get_config_option("contextWorkers", 1),
+            poll_interval=get_config_option("watchPollInterval", 2.0)
+        )
+
+def report_watcher_notice():
+    """Print a message the workspace watcher left from its background thread, once."""
+    if workspace_watcher and workspace_watcher.notice:
+        print(Color.yellow(workspace_watcher.notice))
+        workspace_watcher.notice = None
+
+# BM25 index used to retrieve relevant files for each prompt when "autoRetrieve" is enabled;
+# kept while the directory stays the same so its write lock covers every refresh
+retrieval_index = None
+# One background refresh runs at a time; requests made meanwhile are folded into one rerun
+retrieval_refresh = {"running": False, "pending": None, "error": None}
+retrieval_refresh_lock = threading.Lock()
+
+def refresh_retrieval_index():
+    """Open the retrieval index for the current directory and bring it up to date in the background."""
+    global retrieval_index
+    if not get_config_option("autoRetrieve", False):
+        retrieval_index = None
+        return
+    root = os.getcwd()
+    if retrieval_index is None or retrieval_index.root != os.path.abspath(root):
+        retrieval_index = open_bm25_index(root)
+    index = retrieval_index
+    if index is None:
+        return
+    with retrieval_refresh_lock:
+        if retrieval_refresh["running"]:
+            retrieval_refresh["pending"] = (root, index)
+            return
+        retrieval_refresh["running"] = True
+
+    def update(root, index):
+        while True:
+            try:
+                index.update(
+                    (os.path.join(root, item["path"]), item["content"])
+                    for item in iter_workspace_context(root) if "content" in item
+                )
+                error = None
+            except Exception as e:
+                error = str(e)
+            with retrieval_refresh_lock:
+                retrieval_refresh["error"] = error
+                pending, retrieval_refresh["pending"] = retrieval_refresh["pending"], None
+                if pending is None:
+                    retrieval_refresh["running"] = False
+                    return
+            root, index = pending
+
+    threading.Thread(target=update, args=(root, index), name="retrieval-index", daemon=True).start()
+
+def retrieve_context(prompt):
+    """Build a message with the workspace chunks most relevant to prompt, or None."""
+    if retrieval_index is None:
+        return None, []
+    try:
+        hits = retrieval_index.search(prompt, get_config_option("retrieveTopK", 5))
+    except Exception:
+        return None, []
+    budget = get_config_option("retrieveTokenBudget", 4000)
+    blocks, used, sent = [], 0, []
+    for file_path, start, end, _ in hits:
+        content, _ = read_text_file(file_path, get_config_option("maxFileBytes", 1048576))
+        if content is None:
+            continue
+        excerpt = "\n".join(content.splitlines()[start - 1:end])
+        rel_path = os.path.relpath(file_path, retrieval_index.root)
+        block = f"File: {rel_path} (lines {start}-{end})\n```\n{excerpt}\n```\n\n"
+        if used + estimate_tokens(block) > budget:
+            continue
+        blocks.append(block)
+        used += estimate_tokens(block)
+        sent.append(f"{rel_path}:{start}-{end}")
+    if not blocks:
+        return None, []
+    return {
+        "role": "user",
+        "kind": "retrieval",
+        "content": "Possibly relevant excerpts from the workspace, retrieved automatically:\n\n" + "".join(blocks)
+    }, sent
+
+def grep_workspace(pattern, path="."):
+    """Yield (file_path, line_number, line) for lines matching pattern under path, using the trigram index."""
+    regex = re.compile(pattern)
+    full_path = os.path.abspath(os.path.join(os.getcwd(), path))
+    if not os.path.isdir(full_path):
+        raise NotADirectoryError(f"{full_path} is not a directory")
+    root = find_ignore_root(full_path)
+    file_paths = [file_path for file_path, _ in list_workspace_files(root)]
+    index = open_trigram_index(root)
+    if index is None:
+        # No FTS5 trigram support in this SQLite build: scan every file
+        prefix = os.path.join(full_path, "")
+        for file_path in file_paths:
+            if not file_path.startswith(prefix):
+                continue
+            content, _ = read_text_file(file_path, get_config_option("maxFileBytes", 1048576))
+            for number, line in enumerate((content or "").splitlines(), 1):
+                if regex.search(line):
+                    yield file_path, number, line
+        return
+    try:
+        index.refresh(file_paths, get_config_option("maxFileBytes", 1048576))
+        yield from index.search(regex, full_path)
+    finally:
+        index.close()
+
 # ----------------------------
 # File Edit Mode State
 # ----------------------------
@@ -294,59 +603,408 @@ file_edit_mode = FileEditMode()
 # API Call (Stub)
 # ----------------------------
 
+# OpenAI clients kept alive between requests, one per config profile, all
+# driven from one background event loop
+api_loop = ApiLoop()
+api_clients = ClientPool(api_loop)
+
+def get_api_client(profile=None, **overrides):
+    """Return the pooled OpenAI client for a config profile (default: the active one), with optional CLIENT_OPTIONS overrides.
+
+    In debug mode this is the profile's SimulatedClient instead.
+    """
+    if get_config_option("debug", False, profile):
+        return get_simulated_client(profile)
+    settings = {key: get_config_option(key, default, profile) for key, default in CLIENT_OPTIONS.items()}
+    settings.update(overrides)
+    return api_clients.get(profile or config.get("active", "default"), settings)
+
+def retry_policy(retries=None):
+    """Build the RetryPolicy for API requests from config, optionally overriding the retry count."""
+    return RetryPolicy(
+        retries=retries if retries is not None else get_config_option("maxRetries", 3),
+        base_delay=get_config_option("retryBaseDelay", 0.5),
+        max_delay=get_config_option("retryMaxDelay", 30.0),
+        budget=get_config_option("retryBudget", 60.0)
+    )
+
+# One circuit breaker per config profile, since profiles may point at different endpoints
+circuit_breakers = {}
+
+def circuit_breaker():
+    """Return the active profile's CircuitBreaker, applying the configured threshold and cooldown."""
+    breaker = circuit_breakers.setdefault(config.get("active", "default"), CircuitBreaker())
+    breaker.threshold = get_config_option("circuitBreakerThreshold", 5)
+    breaker.cooldown = get_config_option("circuitBreakerCooldown", 30.0)
+    return breaker
+
+def describe_error(e):
+    """Short description of an API error for retry messages, e.g. "HTTP 503"."""
+    status = getattr(e, "status_code", None)
+    return f"HTTP {status}" if status else (str(e) or type(e).__name__)
+
+# Debug-mode stand-ins for the API, one per profile so each keeps its own random sequence
+simulated_clients = {}
+
+def get_simulated_client(profile=None):
+    """Return the SimulatedClient for a config profile, rebuilding it if its sim* settings changed."""
+    settings = {key: get_config_option(key, default, profile) for key, default in SIMULATOR_OPTIONS.items()}
+    name = profile or config.get("active", "default")
+    client = simulated_clients.get(name)
+    if client is None or client.settings != settings:
+        client = simulated_clients[name] = SimulatedClient(settings)
+    return client
+
+# Result of the startup connection warm-up, reported once with the first request
+connection_warmup = {}
+
+def prewarm_connection():
+    """Open the API connection in the background while the user types, if "prewarmConnection" is enabled."""
+    if not get_config_option("prewarmConnection", False) or get_config_option("debug", False):
+        return
+    if not get_config_option("apiKey", ""):
+        return
+    settings = {key: get_config_option(key, default) for key, default in CLIENT_OPTIONS.items()}
+    profile = config.get("active", "default")
+    timeout = get_config_option("prewarmTimeout", 5.0)
+
+    def warm():
+        try:
+            connection_warmup["seconds"] = api_clients.warm_up(profile, settings, timeout)
+        except Exception as e:
+            connection_warmup["error"] = str(e)
+
+    threading.Thread(target=warm, name="connection-warmup", daemon=True).start()
+
+def report_timings():
+    """Print timing details collected in the background when "logTimings" is enabled."""
+    if not get_config_option("logTimings", False) or connection_warmup.get("reported"):
+        return
+    if "seconds" in connection_warmup:
+        print(Color.dim(f"Connection pre-warmed in {connection_warmup['seconds'] * 1000:.0f} ms"))
+    elif "error" in connection_warmup:
+        print(Color.dim(f"Connection warm-up failed: {connection_warmup['error']}"))
+    else:
+        return
+    connection_warmup["reported"] = True
+
+def conversation_budget():
+    """Tokens the conversation may use: the context window minus room for the reply."""
+    return get_config_option("contextWindowTokens", 128000) - get_config_option("replyTokenReserve", 4096)
+
+def summarize_conversation(text):
+    """Summarize old conversation turns with the cheaper "compactionModel" (used by the Compactor)."""
+    client = get_api_client()
+    response = api_loop.submit(call_with_retries(
+        lambda: client.chat.completions.create(
+            model=get_config_option("compactionModel", "gpt-4o-mini"),
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": text}
+            ],
+            temperature=0
+        ),
+        retry_policy(), circuit_breaker()
+    )).result()
+    return response.choices[0].message.content or ""
+
+def format_usage(used, budget):
+    """Format token usage compactly for the prompt, e.g. 12.3k/124k."""
+    def short(n):
+        return f"{n / 1000:.1f}k" if n < 100000 else f"{n // 1000}k"
+    return f"{short(used)}/{short(budget)}"
+
+# Time-to-first-token samples of hedged requests, and how often hedges fired and won
+ttft_tracker = TtftTracker()
+hedge_stats = {"requests": 0, "fired": 0, "won": 0}
+
+def hedge_target(model):
+    """Return (client, model) for hedge requests: the "hedgeProfile" profile if set, else the active one."""
+    profile = get_config_option("hedgeProfile", "")
+    if not profile:
+        return get_api_client(), model
+    if profile not in config.get("configs", {}):
+        raise ValueError(f"hedgeProfile '{profile}' is not a config profile")
+    return get_api_client(profile), get_config_option("model", model, profile)
+
+def record_hedge(info, delay):
+    """Add a hedged request's outcome to hedge_stats and print it when "logTimings" is enabled."""
+    ttft_tracker.record(info["ttft"])
+    hedge_stats["requests"] += 1
+    if info["hedged"]:
+        hedge_stats["fired"] += 1
+        if info["winner"] == "hedge":
+            hedge_stats["won"] += 1
+    if get_config_option("logTimings", False):
+        outcome = f"hedge fired after {delay:.2f}s, {info['winner']} won" if info["hedged"] else "no hedge"
+        print(Color.dim(f"First token after {info['first_token']:.2f}s ({outcome}); hedges fired for "
+                        f"{hedge_stats['fired']} of {hedge_stats['requests']} request(s), won {hedge_stats['won']}"))
+
+# Prompt tokens reported by the provider this session, and how many were served from its prompt cache
+prompt_cache_stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+def record_usage(usage):
+    """Add a request's usage to prompt_cache_stats and print it when "logTimings" is enabled."""
+    counts = cached_tokens(usage)
+    if counts is None:
+        return
+    prompt_tokens, cached = counts
+    prompt_cache_stats["requests"] += 1
+    prompt_cache_stats["prompt_tokens"] += prompt_tokens
+    prompt_cache_stats["cached_tokens"] += cached
+    if get_config_option("logTimings", False):
+        share = cached / prompt_tokens * 100 if prompt_tokens else 0
+        print(Color.dim(f"Prompt: {prompt_tokens} tokens, {cached} cached by the provider ({share:.0f}%)"))
+
+# On-disk cache of replies, opened on first use
+response_cache = None
+
+def get_response_cache():
+    """Return the response cache (None if it cannot be opened), applying the configured size limit."""
+    global response_cache
+    max_bytes = get_config_option("responseCacheMaxBytes", 52428800)
+    if response_cache is None:
+        response_cache = open_response_cache(max_bytes)
+    else:
+        response_cache.max_bytes = max_bytes
+    return response_cache
+
+def response_cache_for(model, temperature, formatted_messages):
+    """Return (cache, key) if this request may use the response cache, else (None, None).
+
+    Sampled (temperature > 0) replies are only cached when explicitly allowed, and
+    simulated debug-mode replies never are.
+    """
+    if not get_config_option("responseCache", False) or get_config_option("debug", False):
+        return None, None
+    if temperature != 0 and not get_config_option("cacheSampledResponses", False):
+        return None, None
+    cache = get_response_cache()
+    if cache is None:
+        return None, None
+    return cache, request_key(model, temperature, formatted_messages)
+
+def replay_response(text, renderer):
+    """Stream a cached reply through the renderer word by word, like a live reply."""
+    for piece in re.findall(r"\s*\S+|\s+", text):
+        renderer.write(piece)
+
+SYSTEM_PROMPT = "You are a helpful coding assistant. You have access to the user's filesystem."
+
 def call_api(messages):
     """Send messages to OpenAI API and get response."""
     try:
         active_config = get_active_config()
-        
-        # Check debug mode
-        if active_config.get("debug", False):
-            time.sleep(1)  # Simulate API delay
-            return {
-                "success": True,
-                "message": "DEBUG MODE: This is a mock response. Set debug=false to use actual API."
-            }
+        # Debug mode streams from the local simulator through the same path
+        debug = get_config_option("debug", False)
         
         api_key = active_config.get("apiKey")
         model = active_config.get("model", "gpt-4o")
+        temperature = get_config_option("temperature", 0.7)
         
-        if not api_key:
+        if not api_key and not debug:
             return {"success": False, "error": "API key not configured"}
         
-        client = openai.OpenAI(api_key=api_key)
+        # Convert messages to OpenAI format, with a stable prefix for provider prompt caching
+        formatted_messages = assemble(messages, f"Current directory: {os.getcwd()}")
         
-        # Convert messages to OpenAI format
-        formatted_messages = [
-            {"role": msg["role"], "content": msg["content"]}
-            for msg in messages
-        ]
+        cache, cache_key = response_cache_for(model, temperature, formatted_messages)
         
-        # Stream the response
-        response = client.chat.completions.create(
-            model=model,
-            messages=formatted_messages,
-            temperature=0.7,
-            stream=True  # Enable streaming
-        )
+        client = get_api_client()
+        report_timings()
+        policy = retry_policy()
+        hedging = get_config_option("hedgeRequests", False)
+        if hedging:
+            hedge_client, hedge_model = hedge_target(model)
+            # A fixed delay, or the observed p90 time to first token
+            hedge_delay = get_config_option("hedgeDelay", 0.0) or ttft_tracker.delay(90)
         
-        # Initialize variables for streaming
-        full_response = ""
         print(Color.blue("Assistant: "), end="", flush=True)
+        renderer = StreamRenderer()
+        
+        cached = cache.get(cache_key) if cache else None
+        if cached is not None:
+            replay_response(cached, renderer)
+            renderer.finish()
+            print()
+            print(Color.dim("(cached response)"))
+            return {"success": True, "message": cached, "cached": True}
+        
+        def request(target_client, target_model):
+            return lambda write: stream_chat(
+                target_client, write,
+                model=target_model,
+                messages=formatted_messages,
+                temperature=temperature
+            )
         
-        # Process the stream
-        for chunk in response:
-            if chunk.choices[0].delta.content is not None:
-                content = chunk.choices[0].delta.content
-                print(content, end="", flush=True)
-                full_response += content
+        def attempt():
+            if not hedging:
+                return request(client, model)(renderer.write)
+            # Fire an identical request if the first token is late; the slower one is cancelled
+            return hedged(request(client, model), request(hedge_client, hedge_model), renderer.write, hedge_delay)
+        
+        def on_retry(number, delay, error):
+            print(Color.dim(f"{describe_error(error)}, retrying in {delay:.1f}s ({number}/{policy.retries})"))
+        
+        # Stream the response; transient failures are retried only until the first token is shown
+        try:
+            usage = api_loop.run(call_with_retries(
+                attempt,
+                policy, circuit_breaker(),
+                emitted=lambda: renderer.started,
+                on_retry=on_retry
+            ))
+        except KeyboardInterrupt:
+            # Ctrl-C cancels only this request; the stream is closed and the partial reply kept
+            partial = renderer.finish()
+            print()
+            print(Color.yellow("Request cancelled."))
+            return {"success": True, "message": partial, "cancelled": True}
+        except Exception as e:
+            partial = renderer.finish()
+            if not partial:
+                raise
+            # Retrying would repeat what is already on screen, so keep the partial reply
+            print()
+            return {"success": True, "message": partial, "error": f"Reply interrupted: {e}"}
+        finally:
+            renderer.flush()
         
         print()  # New line after streaming completes
+        if hedging:
+            usage, info = usage
+            record_hedge(info, hedge_delay)
+        record_usage(usage)
+        full_response = renderer.finish()
+        if cache:
+            cache.put(cache_key, full_response)
         return {"success": True, "message": full_response}
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+# ----------------------------
+# Batch Mode
+# ----------------------------
+
+def load_batch(in_path):
+    """Read batch records from a JSONL file; each needs a "prompt" and may set "context", "model" and "id"."""
+    records = []
+    with open(in_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{in_path}:{line_no}: invalid JSON ({e})")
+            if not isinstance(record, dict) or not isinstance(record.get("prompt"), str):
+                raise ValueError(f"{in_path}:{line_no}: expected an object with a \"prompt\" string")
+            records.append(record)
+    return records
+
+def run_batch_mode(in_path, out_path, workers=None, rpm=None, tpm=None, retries=None):
+    """Run every prompt in a JSONL file through the API, writing results to out_path as they complete.
+
+    Returns the process exit status.
+    """
+    try:
+        records = load_batch(in_path)
+    except (OSError, ValueError) as e:
+        print(Color.red(f"Error: {e}"))
+        return 1
+    debug = get_config_option("debug", False)
+    if not debug and not get_config_option("apiKey", ""):
+        print(Color.red('Please configure your API key with "/config set apiKey YOUR_API_KEY"'))
+        return 1
+    temperature = get_config_option("temperature", 0.7)
+    budget = get_config_option("contextTokenBudget", 32000)
+    workers = workers or get_config_option("batchWorkers", 8)
+    # Allow one connection per worker so the pool does not cap concurrency
+    max_connections = max(workers, get_config_option("maxConnections", 10))
+    environment = f"Current directory: {os.getcwd()}"
+    contexts = {}
+    contexts_lock = threading.Lock()
+
+    def build_messages(record):
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        path = record.get("context")
+        if path:
+            if not os.path.exists(path):
+                raise ValueError(f"Context path not found: {path}")
+            # Records usually share a few context paths; read each once
+            with contexts_lock:
+                if path not in contexts:
+                    contexts[path] = get_workspace_context(path)
+            result = contexts[path]
+            if not result.get("success"):
+                raise ValueError(f"Cannot get context from {path}: {result.get('error')}")
+            base_path = os.path.abspath(path)
+            if not os.path.isdir(base_path):
+                base_path = os.path.dirname(base_path)
+            packed = pack_context(result["context"], budget, base_path, record["prompt"])
+            messages.append({
+                "role": "user",
+                "kind": "context",
+                "content": f"Here's the current workspace context:\nHere are the files in the workspace ({path}):\n\n" + packed["text"]
+            })
+        messages.append({"role": "user", "content": record["prompt"]})
+        return messages
+
+    async def prepare(record):
+        messages = await asyncio.get_running_loop().run_in_executor(None, build_messages, record)
+        formatted = assemble(messages, environment)
+        model = record.get("model") or get_config_option("model", "gpt-4o")
+        return (model, formatted), sum(message_tokens(message) for message in formatted)
+
+    async def send(request):
+        model, formatted = request
+        cache, cache_key = response_cache_for(model, temperature, formatted)
+        cached = cache.get(cache_key) if cache else None
+        if cached is not None:
+            return {"model": model, "response": cached, "cached": True}
+        parts = []
+        usage = await stream_chat(
+            get_api_client(maxConnections=max_connections), parts.append,
+            model=model,
+            messages=formatted,
+            temperature=temperature
+        )
+        response = "".join(parts)
+        if cache:
+            cache.put(cache_key, response)
+        result = {"model": model, "response": response}
+        counts = cached_tokens(usage)
+        if counts:
+            result["prompt_tokens"], result["cached_tokens"] = counts
+        return result
+
+    print(Color.green(f"Running {len(records)} prompt(s) from {in_path}"))
+    with open(out_path, "w", encoding="utf-8") as out:
+        try:
+            summary = api_loop.run(run_batch(
+                records, prepare, send, out,
+                workers=workers,
+                rpm=rpm if rpm is not None else get_config_option("batchRequestsPerMinute", 0),
+                tpm=tpm if tpm is not None else get_config_option("batchTokensPerMinute", 0),
+                policy=retry_policy(retries if retries is not None else get_config_option("batchRetries", 2)),
+                breaker=circuit_breaker()
+            ))
+        except KeyboardInterrupt:
+            print(Color.yellow(f"\nBatch cancelled; finished results are in {out_path}"))
+            return 130
+
+    print(Color.green(f"Completed {summary['records']} prompt(s) in {summary['elapsed']:.2f}s: "
+                      f"{summary['succeeded']} succeeded, {summary['failed']} failed"))
+    print(f"Throughput: {summary['throughput']:.2f} prompts/s")
+    if summary["p50"] is not None:
+        print(f"Latency: p50 {summary['p50']:.3f}s, p99 {summary['p99']:.3f}s")
+    print(Color.dim(f"Results written to {out_path}"))
+    return 1 if summary["failed"] else 0
+
+
 # ----------------------------
 # Main Interactive Loop
 # ----------------------------
@@ -379,19 +1037,27 @@ def main():
     print(Color.blue("LLM Code") + " - Your AI coding assistant")
     print("Type \"/exit\" to quit or \"/help\" for commands")
     print(Color.dim(f"Working directory: {os.getcwd()}"))
+    prewarm_connection()
+    restart_workspace_watcher()
+    refresh_retrieval_index()
     
     messages = [{
         "role": "system",
-        "content": f"You are a helpful coding assistant. You have access to the user's filesystem.\nCurrent directory: {os.getcwd()}"
+        # Kept byte-identical for prompt caching; the current directory is sent at the end of each request
+        "content": SYSTEM_PROMPT
     }]
+    last_prompt = ""
+    context_tracker = ContextTracker()
+    compactor = Compactor(summarize_conversation)
     
     while True:
+        report_watcher_notice()
         try:
             # Update prompt to show more context
             dir_name = os.path.basename(os.getcwd())
             prompt = (Color.yellow(f"[{dir_name}] edit> ") if file_edit_mode.active and file_edit_mode.mode == "create" else
                      Color.yellow(f"[{dir_name}] append> ") if file_edit_mode.active and file_edit_mode.mode == "append" else
-                     Color.green(f"[{dir_name}]> "))
+                     Color.green(f"[{dir_name} {format_usage(conversation_tokens(messages), conversation_budget())}]> "))
             line = input(prompt)
 
         except (EOFError, KeyboardInterrupt):
@@ -451,7 +1117,10 @@ def main():
                     "/config show": "Show active configuration"
                 },
                 "Context": {
-                    "/context [path], /#": "Get workspace context from path (default: current directory)"
+                    "/context [path], /#": "Get workspace context from path (default: current directory)",
+                    "/map [path]": "Show an outline of the Python code under path and add it to the chat",
+                    "/grep <regex> [path]": "Search workspace files using the trigram index",
+                    "/cache stats|clear": "Show or clear the response cache"
                 }
             }
         
@@ -515,7 +1184,8 @@ def main():
             result = change_directory(path_arg)
             if result.get("success"):
                 print(Color.green(f"Changed directory to: {result['path']}"))
-                messages[0]["content"] = f"You are a helpful coding assistant. You have access to the user's filesystem.\nCurrent directory: {os.getcwd()}"
+                restart_workspace_watcher()
+                refresh_retrieval_index()
             else:
                 print(Color.red(f"Error: {result.get('error')}"))
             continue
@@ -571,122 +1241,158 @@ def main():
             parts = cmd.split(maxsplit=1)
             path = parts[1] if len(parts) > 1 else "."
             print(Color.green(f"Getting context from: {os.path.abspath(path)}"))
-            result = get_workspace_context(path)
+            budget = get_config_option("contextTokenBudget", 32000)
+            streaming = get_config_option("contextStreaming", False)
+            if streaming:
+                # Print files as they are read and stop reading once the budget is full
+                result = {"success": True, "context": [], "skipped": []}
+                try:
+                    for item in iter_workspace_context(path, max_tokens=budget):
+                        if "content" in item:
+                            print_context_file(item)
+                            result["context"].append(item)
+                        else:
+                            result["skipped"].append(item)
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}
+            else:
+                result = get_workspace_context(path)
             if result.get("success"):
                 files = result["context"]
                 print(Color.green(f"\nFound {len(files)} file(s) in workspace:"))
                 
-                # Build context message for chat history
-                context_message = f"Here are the files in the workspace ({path}):\n\n"
-                for file in files:
-                    print(Color.blue(f"\n[{file['path']}]"))
-                    print("─" * 80)
-                    content_lines = file['content'].splitlines()
-                    for i, line in enumerate(content_lines, 1):
-                        print(f"{Color.dim(f'{i:4d} │')} {line}")
-                    print("─" * 80)
-                    
-                    # Add file content to context message
-                    context_message += f"File: {file['path']}\n```\n{file['content']}\n```\n\n"
+                if get_config_option("contextMode", "full") == "outline":
+                    outlines, _ = outline_files(files)
+                    files = [
+                        dict(file, content=outlines[file["path"]]) if file["path"] in outlines else file
+                        for file in files
+                    ]
                 
-                # Add context to chat history
-                messages.append({
-                    "role": "user",
-                    "content": f"Here's the current workspace context:\n{context_message}"
-                })
-                messages.append({
-                    "role": "assistant",
-                    "content": "I've received and understood the workspace context. I'll use this information to provide better assistance."
-                })
-                print(Color.green("\nContext added to chat history."))
+                # Fit the most relevant files into the token budget, or send
+                # only what changed if this path is already in the conversation
+                base_path = os.path.abspath(path)
+                if not os.path.isdir(base_path):
+                    base_path = os.path.dirname(base_path)
+                update = context_tracker.update(
+                    messages, os.path.abspath(path), path, files,
+                    lambda: pack_context(files, budget, base_path, last_prompt)
+                )
+                
+                if update["mode"] == "full":
+                    full = set(update["full"])
+                    if not streaming:
+                        for file in files:
+                            if file["path"] in full:
+                                print_context_file(file)
+                    print(Color.green(f"\nUsing ~{update['tokens']} of {budget} tokens: "
+                                      f"{len(update['full'])} full, {len(update['outlined'])} outlined, "
+                                      f"{len(update['dropped'])} dropped"))
+                    for label, paths in (("Outlined", update["outlined"]), ("Dropped", update["dropped"])):
+                        if paths:
+                            print(Color.dim(f"  {label}: {', '.join(paths)}"))
+                elif update["mode"] == "delta":
+                    print(Color.green(f"\nSending changes since the last context (~{update['tokens']} tokens): "
+                                      f"{len(update['added'])} added, {len(update['changed'])} changed, "
+                                      f"{len(update['removed'])} removed"))
+                    for label in ("added", "changed", "removed"):
+                        if update[label]:
+                            print(Color.dim(f"  {label.capitalize()}: {', '.join(update[label])}"))
+                
+                skipped = result.get("skipped", [])
+                if skipped:
+                    print(Color.yellow(f"\nSkipped {len(skipped)} file(s):"))
+                    for file in skipped:
+                        print(Color.dim(f"  {file['path']}: {file['reason']}"))
+                
+                if update["mode"] == "unchanged":
+                    print(Color.green("\nContext is already up to date in chat history."))
+                else:
+                    print(Color.green("\nContext added to chat history."))
+                refresh_retrieval_index()
             else:
                 print(Color.red(f"Error: {result.get('error')}"))
             continue
 
-        if cmd.startswith("/ls"):
-            parts = cmd.split(maxsplit=1)
-            dir_path = parts[1] if len(parts) > 1 else "."
-            result = list_directory(dir_path)
-            if result.get("success"):
-                output = [Color.green(f"Contents of: {result['path']}")]
-                files = result["files"]
-                files.sort(key=lambda x: (not x.get("isDirectory", False), x["name"].lower()))
-                for f in files:
-                    if f.get("isDirectory"):
-                        output.append(f"{f['name']}/")
-                    elif f.get("error"):
-                        output.append(f"{f['name']} (error: {f['error']})")
-                    else:
-                        output.append(f"{f['name']}")
-                
-                # Print to terminal
-                print("\n".join(output))
-                
-                # Add to AI context
-                messages.append({
-                    "role": "user",
-                    "content": f"Directory listing for {result['path']}:\n" + "\n".join(output)
-                })
+        if cmd.startswith("/cache"):
+            parts = cmd.split()
+            action = parts[1] if len(parts) > 1 else "stats"
+            cache = get_response_cache()
+            if cache is None:
+                print(Color.red("Response cache is unavailable."))
+            elif action == "stats":
+                stats = cache.stats()
+                print(Color.green("Response cache:"))
+                print(f"  enabled: {get_config_option('responseCache', False)}")
+                print(f"  entries: {stats['entries']}")
+                print(f"  size: {stats['bytes']} of {stats['max_bytes']} bytes")
+                print(f"  hits this session: {stats['session_hits']} (misses: {stats['session_misses']})")
+                print(f"  hits overall: {stats['total_hits']}")
+                if prompt_cache_stats["requests"]:
+                    print(f"  provider prompt cache: {prompt_cache_stats['cached_tokens']} of "
+                          f"{prompt_cache_stats['prompt_tokens']} prompt tokens cached "
+                          f"over {prompt_cache_stats['requests']} request(s)")
+                print(Color.dim(f"  {stats['path']}"))
+            elif action == "clear":
+                print(Color.green(f"Removed {cache.clear()} cached response(s)."))
             else:
-                print(Color.red(f"Error: {result.get('error')}"))
+                print(Color.red("Invalid cache command. Use: /cache stats|clear"))
             continue
 
-        if cmd.startswith("/tree"):
-            parts = cmd.split(maxsplit=1)
-            path = parts[1] if len(parts) > 1 else "."
-            print(Color.green(f"Directory tree for: {os.path.abspath(path)}"))
-            
-            # Capture tree output
-            import io
-            from contextlib import redirect_stdout
-            
-            tree_output = io.StringIO()
-            with redirect_stdout(tree_output):
-                print_tree(path)
-            
-            # Print to terminal
-            print(tree_output.getvalue())
+        if cmd.startswith("/grep"):
+            try:
+                args = shlex.split(cmd[len("/grep"):])
+            except ValueError:
+                args = cmd[len("/grep"):].split()
+            if not args:
+                print(Color.red("Missing pattern. Use: /grep <regex> [path]"))
+                continue
+            pattern = args[0]
+            path = args[1] if len(args) > 1 else "."
+            base = os.path.abspath(path)
+            max_results = get_config_option("grepMaxResults", 500)
+            start = time.perf_counter()
+            found = []
+            try:
+                # Print matches as they are found
+                for file_path, number, line in grep_workspace(pattern, path):
+                    rel_path = os.path.relpath(file_path, base)
+                    print(f"{Color.blue(rel_path)}{Color.dim(f':{number}:')} {line}")
+                    found.append(f"{rel_path}:{number}: {line}")
+                    if len(found) >= max_results:
+                        print(Color.yellow(f"Stopped after {max_results} matches."))
+                        break
+            except (re.error, OSError) as e:
+                print(Color.red(f"Error: {e}"))
+                continue
+            files = len({entry.split(":", 1)[0] for entry in found})
+            print(Color.green(f"{len(found)} match(es) in {files} file(s) ({time.perf_counter() - start:.2f}s)"))
             
             # Add to AI context
-            messages.append({
-                "role": "user",
-                "content": f"Directory tree for {os.path.abspath(path)}:\n{tree_output.getvalue()}"
-            })
+            if found and get_config_option("grepAddToContext", False):
+                messages.append({
+                    "role": "user",
+                    "kind": "grep",
+                    "content": f"Search results for /{pattern}/ in {base}:\n" + "\n".join(found)
+                })
             continue
 
-        # Context commands (already handling context properly)
-        if cmd.startswith("/context") or cmd.startswith("/#"):
+        if cmd.startswith("/map"):
             parts = cmd.split(maxsplit=1)
             path = parts[1] if len(parts) > 1 else "."
-            print(Color.green(f"Getting context from: {os.path.abspath(path)}"))
+            print(Color.green(f"Repository map for: {os.path.abspath(path)}"))
             result = get_workspace_context(path)
             if result.get("success"):
-                files = result["context"]
-                print(Color.green(f"\nFound {len(files)} file(s) in workspace:"))
+                repo_map, stats = build_repo_map(result["context"])
+                print(repo_map)
+                print(Color.dim(f"{stats['python']} Python file(s): {stats['parsed']} parsed, "
+                                f"{stats['cached']} from cache, ~{estimate_tokens(repo_map)} tokens"))
                 
-                # Build context message for chat history
-                context_message = f"Here are the files in the workspace ({path}):\n\n"
-                for file in files:
-                    print(Color.blue(f"\n[{file['path']}]"))
-                    print("─" * 80)
-                    content_lines = file['content'].splitlines()
-                    for i, line in enumerate(content_lines, 1):
-                        print(f"{Color.dim(f'{i:4d} │')} {line}")
-                    print("─" * 80)
-                    
-                    # Add file content to context message
-                    context_message += f"File: {file['path']}\n```\n{file['content']}\n```\n\n"
-                
-                # Add context to chat history
+                # Add to AI context
                 messages.append({
                     "role": "user",
-                    "content": f"Here's the current workspace context:\n{context_message}"
+                    "kind": "repo-map",
+                    "content": f"Repository map for {os.path.abspath(path)}:\n{repo_map}"
                 })
-                messages.append({
-                    "role": "assistant",
-                    "content": "I've received and understood the workspace context. I'll use this information to provide better assistance."
-                })
-                print(Color.green("\nContext added to chat history."))
             else:
                 print(Color.red(f"Error: {result.get('error')}"))
             continue
@@ -700,12 +1406,13 @@ def main():
                 files = result["files"]
                 files.sort(key=lambda x: (not x.get("isDirectory", False), x["name"].lower()))
                 for f in files:
+                    ignored = " (ignored)" if f.get("ignored") else ""
                     if f.get("isDirectory"):
-                        output.append(f"{f['name']}/")
+                        output.append(f"{f['name']}/{ignored}")
                     elif f.get("error"):
                         output.append(f"{f['name']} (error: {f['error']})")
                     else:
-                        output.append(f"{f['name']}")
+                        output.append(f"{f['name']}{ignored}")
                 
                 # Print to terminal
                 print("\n".join(output))
@@ -713,6 +1420,7 @@ def main():
                 # Add to AI context
                 messages.append({
                     "role": "user",
+                    "kind": "ls",
                     "content": f"Directory listing for {result['path']}:\n" + "\n".join(output)
                 })
             else:
@@ -738,85 +1446,79 @@ def main():
             # Add to AI context
             messages.append({
                 "role": "user",
+                "kind": "tree",
                 "content": f"Directory tree for {os.path.abspath(path)}:\n{tree_output.getvalue()}"
             })
             continue
 
-        # Context commands (already handling context properly)
-        if cmd.startswith("/context") or cmd.startswith("/#"):
-            parts = cmd.split(maxsplit=1)
-            path = parts[1] if len(parts) > 1 else "."
-            print(Color.green(f"Getting context from: {os.path.abspath(path)}"))
-            result = get_workspace_context(path)
-            if result.get("success"):
-                files = result["context"]
-                print(Color.green(f"\nFound {len(files)} file(s) in workspace:"))
-                
-                # Build context message for chat history
-                context_message = f"Here are the files in the workspace ({path}):\n\n"
-                for file in files:
-                    print(Color.blue(f"\n[{file['path']}]"))
-                    print("─" * 80)
-                    content_lines = file['content'].splitlines()
-                    for i, line in enumerate(content_lines, 1):
-                        print(f"{Color.dim(f'{i:4d} │')} {line}")
-                    print("─" * 80)
-                    
-                    # Add file content to context message
-                    context_message += f"File: {file['path']}\n```\n{file['content']}\n```\n\n"
-                
-                # Add context to chat history
-                messages.append({
-                    "role": "user",
-                    "content": f"Here's the current workspace context:\n{context_message}"
-                })
-                messages.append({
-                    "role": "assistant",
-                    "content": "I've received and understood the workspace context. I'll use this information to provide better assistance."
-                })
-                print(Color.green("\nContext added to chat history."))
-            else:
-                print(Color.red(f"Error: {result.get('error')}"))
-            continue
-
-        if cmd.startswith("/ls"):
-            parts = cmd.split(maxsplit=1)
-            dir_path = parts[1] if len(parts) > 1 else "."
-            result = list_directory(dir_path)
-            if result.get("success"):
-                print(Color.green(f"Contents of: {result['path']}"))
-                files = result["files"]
-                files.sort(key=lambda x: (not x.get("isDirectory", False), x["name"].lower()))
-                for f in files:
-                    if f.get("isDirectory"):
-                        print(Color.blue(f"{f['name']}/"))
-                    elif f.get("error"):
-                        print(Color.red(f"{f['name']} (error: {f['error']})"))
-                    else:
-                        print(f["name"])
-            else:
-                print(Color.red(f"Error: {result.get('error')}"))
-            continue
-
-        if cmd.startswith("/tree"):
-            parts = cmd.split(maxsplit=1)
-            path = parts[1] if len(parts) > 1 else "."
-            print(Color.green(f"Directory tree for: {os.path.abspath(path)}"))
-            print_tree(path)
-            continue
-
         # In the main loop, update the response handling:
         # If not a built-in command, send as a message to the assistant
+        last_prompt = cmd
         messages.append({"role": "user", "content": cmd})
-        response = call_api(messages)
-        if response.get("success"):
+        # Retrieved excerpts go with this request only; they are not kept in the history
+        retrieved, sources = retrieve_context(cmd)
+        if retrieved:
+            print(Color.dim(f"Retrieved: {', '.join(sources)}"))
+        with retrieval_refresh_lock:
+            refresh_error, retrieval_refresh["error"] = retrieval_refresh["error"], None
+        if refresh_error:
+            print(Color.yellow(f"Retrieval index update failed: {refresh_error}"))
+        
+        # Swap in a summary of old turns if one finished in the background
+        compacted = compactor.apply(messages)
+        if compacted:
+            replaced, summary = compacted
+            print(Color.dim(f"Compacted {len(replaced)} earlier message(s), ~{conversation_tokens(replaced)} tokens, "
+                            f"into a summary of ~{message_tokens(summary)} tokens."))
+        elif compactor.error:
+            print(Color.dim(f"Compaction failed, will retry later: {compactor.error}"))
+            compactor.error = None
+        
+        # Keep the conversation within the model's context window
+        budget = conversation_budget() - (message_tokens(retrieved) if retrieved else 0)
+        evicted = fit_to_budget(
+            messages, budget,
+            get_config_option("evictionPolicy", "stale-first"),
+            get_config_option("keepLastExchanges", 4)
+        )
+        if evicted:
+            print(Color.dim(f"Evicted {len(evicted)} message(s), ~{conversation_tokens(evicted)} tokens, "
+                            f"to fit the context window: {', '.join(describe(m) for m in evicted)}"))
+        if retrieved:
+            response = call_api(messages[:-1] + [retrieved, messages[-1]])
+        else:
+            response = call_api(messages)
+        if response.get("cancelled") and not response.get("message"):
+            # Nothing arrived before Ctrl-C: drop the unanswered prompt
+            messages.pop()
+        elif response.get("success"):
             assistant_msg = response.get("message", "")
             # Don't print the message again since it was streamed
             messages.append({"role": "assistant", "content": assistant_msg})
+            if response.get("error"):
+                print(Color.red(f"Error: {response['error']}"))
+            
+            # Summarize old turns in the background while the user reads the reply
+            if get_config_option("autoCompact", False):
+                compactor.threshold = get_config_option("compactThreshold", 0.75)
+                compactor.keep_last = get_config_option("keepLastExchanges", 4)
+                compactor.maybe_start(messages, conversation_budget())
         else:
             print(Color.red(f"Error: {response.get('error', 'Could not get response from API.')}"))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM Code - your AI-powered coding companion in the terminal")
+    parser.add_argument("--batch", metavar="IN_JSONL", help="run the prompts in a JSONL file without the interactive prompt")
+    parser.add_argument("--out", metavar="OUT_JSONL", help="file to write batch results to (required with --batch)")
+    parser.add_argument("--workers", type=int, help="concurrent requests in batch mode (default: batchWorkers)")
+    parser.add_argument("--rpm", type=int, help="requests per minute limit in batch mode (default: batchRequestsPerMinute)")
+    parser.add_argument("--tpm", type=int, help="prompt tokens per minute limit in batch mode (default: batchTokensPerMinute)")
+    parser.add_argument("--retries", type=int, help="retries per failed prompt in batch mode (default: batchRetries)")
+    args = parser.parse_args()
+    if args.batch:
+        if not args.out:
+            parser.error("--batch requires --out")
+        sys.exit(run_batch_mode(args.batch, args.out, args.workers, args.rpm, args.tpm, args.retries))
     try:
         main()
     except Exception:
@@ -0,0 +1,176 @@
+import time
+import asyncio
+import threading
+
+import openai
+
+try:
+    import httpx
+except ImportError:  # newer openai releases depend on httpx2 instead
+    import httpx2 as httpx
+
+# Config keys (and defaults) a client is built from; changing any of them rebuilds it.
+CLIENT_OPTIONS = {
+    "apiKey": "",
+    "baseUrl": "",
+    "requestTimeout": 600.0,
+    "connectTimeout": 10.0,
+    "maxConnections": 10,
+    "maxKeepaliveConnections": 5,
+    "keepaliveExpiry": 30.0,
+}
+
+
+def build_client(settings, use_async=False):
+    """Build an OpenAI client with its own keep-alive connection pool from a CLIENT_OPTIONS dict.
+
+    Returns (client, http_client); both are async when `use_async` is set.
+    The SDK's own retries are disabled; callers retry through utils.resilience.
+    """
+    timeout = httpx.Timeout(settings["requestTimeout"], connect=settings["connectTimeout"])
+    limits = httpx.Limits(
+        max_connections=settings["maxConnections"],
+        max_keepalive_connections=settings["maxKeepaliveConnections"],
+        keepalive_expiry=settings["keepaliveExpiry"],
+    )
+    if use_async:
+        http_client = openai.DefaultAsyncHttpxClient(timeout=timeout, limits=limits)
+        client_class = openai.AsyncOpenAI
+    else:
+        http_client = openai.DefaultHttpxClient(timeout=timeout, limits=limits)
+        client_class = openai.OpenAI
+    client = client_class(
+        api_key=settings["apiKey"],
+        base_url=settings["baseUrl"] or None,
+        timeout=timeout,
+        max_retries=0,
+        http_client=http_client,
+    )
+    return client, http_client
+
+
+class ApiLoop:
+    """An asyncio event loop running in a background thread.
+
+    Async clients are bound to the loop they first connect on, so all API
+    calls share this one long-lived loop and their pooled connections
+    survive between requests. The thread starts on first use.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="api-loop", daemon=True).start()
+        return self.loop
+
+    def submit(self, coro):
+        """Schedule `coro` on the loop and return a concurrent.futures.Future for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+
+    def run(self, coro):
+        """Run `coro` on the loop and wait for its result.
+
+        On Ctrl-C the coroutine is cancelled and allowed to unwind (closing
+        any open stream) before KeyboardInterrupt is re-raised.
+        """
+        finished = threading.Event()
+
+        async def guarded():
+            try:
+                return await coro
+            finally:
+                finished.set()
+
+        future = self.submit(guarded())
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            finished.wait(5)
+            raise
+
+
+async def stream_chat(client, on_delta, **request):
+    """Stream a chat completion from an AsyncOpenAI client, passing each text delta to `on_delta`.
+
+    Returns the usage reported at the end of the stream, or None. When the
+    task is cancelled the HTTP response is closed right away, so the server
+    stops generating.
+    """
+    stream = await client.chat.completions.create(
+        stream=True, stream_options={"include_usage": True}, **request
+    )
+    usage = None
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                on_delta(chunk.choices[0].delta.content)
+    finally:
+        await stream.close()
+    return usage
+
+
+class ClientPool:
+    """One OpenAI client per config profile, reused across requests.
+
+    Each client owns an HTTP connection pool, so keeping it alive lets later
+    requests reuse warm keep-alive connections instead of paying TCP and TLS
+    setup on every turn. A profile's client is rebuilt only when the
+    settings it was built from change (e.g. after /config set apiKey).
+    Given an ApiLoop, the pool holds AsyncOpenAI clients used on that loop.
+    """
+
+    def __init__(self, api_loop=None):
+        self.api_loop = api_loop
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, profile, settings):
+        key = tuple(sorted(settings.items()))
+        with self._lock:
+            entry = self._clients.get(profile)
+            if entry and entry[0] == key:
+                return entry
+            old, entry = entry, (key,) + build_client(settings, use_async=self.api_loop is not None)
+            self._clients[profile] = entry
+        if old:
+            self._close(old[1])
+        return entry
+
+    def _close(self, client):
+        if self.api_loop:
+            self.api_loop.submit(client.close())
+        else:
+            client.close()
+
+    def get(self, profile, settings):
+        """Return the client for `profile`, (re)building it if `settings` changed."""
+        return self._entry(profile, settings)[1]
+
+    def warm_up(self, profile, settings, timeout):
+        """Open a connection to the API for `profile` and leave it in the pool.
+
+        Sends a HEAD request to the base URL, which costs no tokens; any
+        HTTP response means the TCP and TLS handshakes are done. Returns the
+        seconds taken, and raises on connection errors or after `timeout`.
+        """
+        _, client, http_client = self._entry(profile, settings)
+        start = time.perf_counter()
+        if self.api_loop:
+            self.api_loop.submit(http_client.head(str(client.base_url), timeout=timeout)).result()
+        else:
+            http_client.head(str(client.base_url), timeout=timeout)
+        return time.perf_counter() - start
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for _, client, _ in clients.values():
+            self._close(client)
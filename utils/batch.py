@@ -0,0 +1,124 @@
+import json
+import time
+import asyncio
+
+from utils.resilience import RetryPolicy, call_with_retries
+
+
+class TokenBucket:
+    """Async token bucket refilled at `rate` per second, holding at most `capacity`.
+
+    Used for both requests per minute (cost 1 per request) and tokens per
+    minute (cost = estimated prompt tokens).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def per_minute_bucket(limit):
+    """A TokenBucket for a per-minute limit (allowing a full minute's burst), or None if unlimited."""
+    return TokenBucket(limit / 60, limit) if limit and limit > 0 else None
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of `values`, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+async def run_batch(records, prepare, send, out, workers=8, rpm=None, tpm=None, policy=None, breaker=None):
+    """Run every record through the API with at most `workers` requests in flight.
+
+    `prepare(record)` returns (request, estimated_tokens) and `send(request)`
+    returns a dict of result fields; both are coroutines. Each attempt waits
+    for the request and token buckets, and transient failures are retried
+    under `policy` (a RetryPolicy) and `breaker` (a CircuitBreaker). One
+    JSON line per record is written to `out` as soon as it completes.
+    Returns a summary with throughput and p50/p99 latency of successful
+    requests.
+    """
+    policy = policy or RetryPolicy()
+    request_bucket = per_minute_bucket(rpm)
+    token_bucket = per_minute_bucket(tpm)
+    queue = asyncio.Queue()
+    for item in enumerate(records):
+        queue.put_nowait(item)
+    latencies = []
+    failed = 0
+
+    async def run_one(index, record):
+        result = {"index": index}
+        if "id" in record:
+            result["id"] = record["id"]
+        try:
+            request, tokens = await prepare(record)
+        except Exception as e:
+            return dict(result, error=str(e), attempts=0)
+        attempts = 0
+        start = None
+
+        async def attempt():
+            nonlocal attempts, start
+            if request_bucket:
+                await request_bucket.acquire(1)
+            if token_bucket:
+                await token_bucket.acquire(tokens)
+            attempts += 1
+            start = time.perf_counter()
+            return await send(request)
+
+        try:
+            fields = await call_with_retries(attempt, policy, breaker)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return dict(result, error=str(e), attempts=attempts)
+        latency = time.perf_counter() - start
+        latencies.append(latency)
+        return dict(result, **fields, latency=round(latency, 3), attempts=attempts)
+
+    async def worker():
+        nonlocal failed
+        while True:
+            try:
+                index, record = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = await run_one(index, record)
+            if "error" in result:
+                failed += 1
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(records))))))
+    elapsed = time.perf_counter() - start
+    return {
+        "records": len(records),
+        "succeeded": len(records) - failed,
+        "failed": failed,
+        "elapsed": elapsed,
+        "throughput": len(records) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }
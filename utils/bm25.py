@@ -0,0 +1,170 @@
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+
+CACHE_DIR = os.path.expanduser("~/.llm_code_cache/bm25")
+SCHEMA_VERSION = "1"
+# Lines per indexed chunk; retrieval returns chunks rather than whole files.
+CHUNK_LINES = 60
+# Query terms kept after dropping stopwords, rarest first.
+MAX_QUERY_TERMS = 12
+# Terms found in more than this share of chunks carry almost no signal
+# and make the query slow, so they are left out (unless no other term is left).
+MAX_TERM_DF_RATIO = 0.2
+
+WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+SUBWORD_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be but by can could do does for from has have how i if in into is it its
+me my no not of on or our please should so that the their then there these this to was we
+what when where which who why will with would you your
+""".split())
+
+
+def tokenize(text):
+    """Split text into lowercase terms, adding camelCase and snake_case parts of identifiers."""
+    terms = []
+    for word in WORD_RE.findall(text):
+        lower = word.lower()
+        if len(lower) > 1 and lower not in STOPWORDS:
+            terms.append(lower)
+        parts = [part.lower() for piece in word.split("_") for part in SUBWORD_RE.findall(piece)]
+        if len(parts) > 1:
+            terms.extend(part for part in parts if len(part) > 1 and part not in STOPWORDS)
+    return terms
+
+
+def index_path_for(root):
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{digest}.sqlite3")
+
+
+class BM25Index:
+    """Persistent BM25 index over workspace files, split into line chunks.
+
+    Stored in SQLite FTS5, whose inverted index and bm25() ranking do the
+    heavy lifting; terms are pre-tokenized here so identifiers match on
+    their camelCase/snake_case parts. Files are re-indexed only when their
+    size or mtime changes.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.db_path = index_path_for(self.root)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._write_lock = threading.Lock()
+        conn = self._connect()
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if str(version) != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS files")
+                conn.execute("DROP TABLE IF EXISTS chunks")
+                conn.execute("DROP TABLE IF EXISTS chunks_vocab")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, first_chunk INTEGER, chunks INTEGER)")
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+                "path UNINDEXED, start UNINDEXED, end UNINDEXED, terms, "
+                "tokenize = \"unicode61 tokenchars '_'\")"
+            )
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_vocab USING fts5vocab(chunks, 'row')")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    @staticmethod
+    def _delete_chunks(conn, entry):
+        # A file's chunks occupy a contiguous rowid range, so deleting them
+        # never scans the (unindexed) path column.
+        _, _, first, count = entry
+        conn.execute("DELETE FROM chunks WHERE rowid >= ? AND rowid < ?", (first, first + count))
+
+    def update(self, files):
+        """Bring the index up to date with `files`, a list of (abs_path, content) pairs.
+
+        Returns the number of files (re)indexed. Files not in the list are
+        removed from the index.
+        """
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                known = {
+                    path: (size, mtime, first, count)
+                    for path, size, mtime, first, count in conn.execute(
+                        "SELECT path, size, mtime_ns, first_chunk, chunks FROM files")
+                }
+                next_rowid = (conn.execute("SELECT max(rowid) FROM chunks").fetchone()[0] or 0) + 1
+                seen = set()
+                indexed = 0
+                for path, content in files:
+                    seen.add(path)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    old = known.get(path)
+                    if old and old[:2] == (st.st_size, st.st_mtime_ns):
+                        continue
+                    if old:
+                        self._delete_chunks(conn, old)
+                    lines = content.splitlines()
+                    rows = []
+                    for start in range(0, max(len(lines), 1), CHUNK_LINES):
+                        chunk = "\n".join(lines[start:start + CHUNK_LINES])
+                        terms = tokenize(os.path.basename(path) + "\n" + chunk)
+                        if terms:
+                            rows.append((next_rowid + len(rows), path, start + 1,
+                                         min(start + CHUNK_LINES, len(lines)), " ".join(terms)))
+                    conn.executemany("INSERT INTO chunks (rowid, path, start, end, terms) VALUES (?, ?, ?, ?, ?)", rows)
+                    conn.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, first_chunk, chunks) "
+                                 "VALUES (?, ?, ?, ?, ?)", (path, st.st_size, st.st_mtime_ns, next_rowid, len(rows)))
+                    next_rowid += len(rows)
+                    indexed += 1
+                for path in set(known) - seen:
+                    self._delete_chunks(conn, known[path])
+                    conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                conn.commit()
+                return indexed
+            finally:
+                conn.close()
+
+    def search(self, query, k=5):
+        """Return up to `k` (path, start_line, end_line, score) chunks ranked by BM25."""
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        conn = self._connect()
+        try:
+            chunks = conn.execute("SELECT sum(chunks) FROM files").fetchone()[0]
+            if not chunks:
+                return []
+            df = dict(conn.execute(
+                "SELECT term, doc FROM chunks_vocab WHERE term IN (%s)" % ",".join("?" * len(terms)), terms
+            ))
+            present = sorted((df[t], t) for t in terms if t in df)
+            # In a small workspace every term can pass the ratio; rank by all of them then
+            useful = [(n, t) for n, t in present if n <= chunks * MAX_TERM_DF_RATIO] or present
+            if not useful:
+                return []
+            match = " OR ".join('"%s"' % t for _, t in useful[:MAX_QUERY_TERMS])
+            return conn.execute(
+                "SELECT path, start, end, bm25(chunks) AS score FROM chunks "
+                "WHERE chunks MATCH ? ORDER BY score LIMIT ?", (match, k)
+            ).fetchall()
+        finally:
+            conn.close()
+
+
+def open_index(root):
+    """Open the BM25 index for `root`, or None if SQLite lacks FTS5 or the cache is unusable."""
+    try:
+        return BM25Index(root)
+    except (sqlite3.Error, OSError):
+        return None
@@ -0,0 +1,104 @@
+import time
+import threading
+
+from utils.conversation import STALE_KINDS, conversation_tokens, message_units
+
+SUMMARY_PROMPT = (
+    "Summarize the earlier part of a conversation between a user and a coding assistant so it can "
+    "replace those messages. Keep decisions, requirements, file and function names, code facts, "
+    "errors and open questions. Drop pleasantries. Be concise."
+)
+# Seconds to wait after a failed summarization before trying again.
+RETRY_DELAY = 60
+# Fewer units than this are not worth a summarization request.
+MIN_UNITS = 2
+
+
+class Compactor:
+    """Replaces old conversation turns with a summary, written in the background.
+
+    When the conversation passes `threshold` of the token budget, the
+    oldest turns (outside the last `keep_last` units) are sent to
+    `summarize(text) -> str` on a background thread. The result is applied
+    on the prompt loop's next request by apply(); nothing blocks while the
+    summary is being written. Workspace-context blocks and other command
+    output are never summarized, since they are refreshed or evicted
+    instead. A failed attempt leaves the conversation unchanged and is
+    retried after RETRY_DELAY.
+    """
+
+    def __init__(self, summarize, threshold=0.75, keep_last=4):
+        self.summarize = summarize
+        self.threshold = threshold
+        self.keep_last = keep_last
+        self.error = None
+        self._job = None
+        self._result = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def _select(self, messages):
+        units = message_units(messages)
+        protected = units[-self.keep_last:] if self.keep_last > 0 else []
+        chosen = [
+            unit for unit in units[:len(units) - len(protected)]
+            if messages[unit[0]].get("kind") not in STALE_KINDS
+        ]
+        return [messages[i] for unit in chosen for i in unit] if len(chosen) >= MIN_UNITS else []
+
+    def maybe_start(self, messages, budget):
+        """Start summarizing old turns if the conversation is over the threshold. Returns True if started."""
+        with self._lock:
+            if self._job is not None or time.monotonic() < self._retry_at:
+                return False
+            if conversation_tokens(messages) <= budget * self.threshold:
+                return False
+            chosen = self._select(messages)
+            if not chosen:
+                return False
+            self._job = chosen
+            self._result = None
+        text = "\n\n".join(f"{message['role']}: {message['content']}" for message in chosen)
+        threading.Thread(target=self._run, args=(text,), name="compaction", daemon=True).start()
+        return True
+
+    def _run(self, text):
+        try:
+            summary = self.summarize(text)
+            result = ("ok", summary)
+        except Exception as e:
+            result = ("error", str(e))
+        with self._lock:
+            self._result = result
+
+    def apply(self, messages):
+        """Swap a finished summary into `messages` in place.
+
+        Returns (replaced_messages, summary_message) when a summary was
+        applied, or None. Turns evicted in the meantime are simply skipped;
+        if none of them remain, the summary is dropped.
+        """
+        with self._lock:
+            if self._job is None or self._result is None:
+                return None
+            job, (status, value) = self._job, self._result
+            self._job = self._result = None
+            if status == "error":
+                self.error = value
+                self._retry_at = time.monotonic() + RETRY_DELAY
+                return None
+            self.error = None
+        ids = {id(message) for message in job}
+        positions = [i for i, message in enumerate(messages) if id(message) in ids]
+        if not positions:
+            return None
+        summary = {
+            "role": "user",
+            "kind": "summary",
+            "content": f"Summary of the earlier conversation:\n{value}"
+        }
+        replaced = [messages[i] for i in positions]
+        kept = [message for message in messages if id(message) not in ids]
+        kept.insert(positions[0], summary)
+        messages[:] = kept
+        return replaced, summary
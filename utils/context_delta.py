@@ -0,0 +1,113 @@
+import difflib
+
+from utils.tokens import estimate_tokens
+
+CONTEXT_ACK = "I've received and understood the workspace context. I'll use this information to provide better assistance."
+DELTA_ACK = "I've updated my view of the workspace with these changes."
+
+# Resend everything once the accumulated delta grows past this share of the base.
+MAX_DELTA_RATIO = 0.5
+
+
+def format_delta(added, changed, removed):
+    """Format added files, unified diffs of changed files and removed paths."""
+    parts = []
+    for path, content in added:
+        parts.append(f"Added file: {path}\n```\n{content}\n```\n\n")
+    for path, old, new in changed:
+        diff = "".join(difflib.unified_diff(
+            old.splitlines(keepends=True), new.splitlines(keepends=True),
+            fromfile=f"a/{path}", tofile=f"b/{path}"
+        ))
+        if not diff.endswith("\n"):
+            diff += "\n"
+        parts.append(f"Changed file: {path}\n```diff\n{diff}```\n\n")
+    if removed:
+        parts.append("Removed files: " + ", ".join(removed) + "\n")
+    return "".join(parts)
+
+
+class ContextTracker:
+    """Remembers which file versions a conversation has already been sent.
+
+    The first /context for a path adds a full snapshot to the conversation.
+    Later refreshes add only what changed relative to that snapshot, as one
+    cumulative delta that replaces the previous delta, so a conversation
+    carries at most a base and one delta per path. Once the delta grows past
+    MAX_DELTA_RATIO of the base (or the base has been removed from the
+    conversation), the snapshot is resent in full.
+    """
+
+    def __init__(self):
+        self._state = {}
+
+    def reset(self):
+        self._state.clear()
+
+    @staticmethod
+    def _remove(messages, pair):
+        for message in pair or ():
+            for i, existing in enumerate(messages):
+                if existing is message:
+                    del messages[i]
+                    break
+
+    def update(self, messages, key, header, files, pack):
+        """Add the workspace context for `key` to `messages`.
+
+        `files` is the current list of {"path", "content"} dicts and `pack`
+        a callable returning a pack_context() result for a full resend.
+        Returns a summary dict whose "mode" is "full", "delta" or "unchanged".
+        """
+        current = {file["path"]: file["content"] for file in files}
+        state = self._state.get(key)
+        if state and any(message is state["base"][0] for message in messages):
+            sent = state["files"]
+            added = [(path, current[path]) for path in sorted(current) if path not in state["known"]]
+            changed = [
+                (path, sent[path], current[path]) for path in sorted(sent)
+                if path in current and current[path] != sent[path]
+            ]
+            removed = sorted(path for path in state["known"] if path not in current)
+            summary = {
+                "added": [path for path, _ in added],
+                "changed": [path for path, _, _ in changed],
+                "removed": removed,
+            }
+            if not (added or changed or removed):
+                self._remove(messages, state["delta"])
+                state["delta"] = None
+                return dict(summary, mode="unchanged", tokens=0)
+            text = format_delta(added, changed, removed)
+            tokens = estimate_tokens(text)
+            if tokens <= state["tokens"] * MAX_DELTA_RATIO:
+                self._remove(messages, state["delta"])
+                state["delta"] = (
+                    {"role": "user", "kind": "context-delta",
+                     "content": f"Workspace changes since the context above ({header}):\n\n{text}"},
+                    {"role": "assistant", "kind": "context-delta", "content": DELTA_ACK},
+                )
+                messages.extend(state["delta"])
+                return dict(summary, mode="delta", tokens=tokens)
+
+        if state:
+            self._remove(messages, state["base"])
+            self._remove(messages, state["delta"])
+        packed = pack()
+        context_message = f"Here are the files in the workspace ({header}):\n\n" + packed["text"]
+        if packed["dropped"]:
+            context_message += "Omitted to fit the context budget: " + ", ".join(packed["dropped"]) + "\n"
+        base = (
+            {"role": "user", "kind": "context",
+             "content": f"Here's the current workspace context:\n{context_message}"},
+            {"role": "assistant", "kind": "context", "content": CONTEXT_ACK},
+        )
+        messages.extend(base)
+        self._state[key] = {
+            "files": {path: current[path] for path in packed["full"]},
+            "known": set(current),
+            "tokens": max(packed["tokens"], 1),
+            "base": base,
+            "delta": None,
+        }
+        return dict(packed, mode="full")
@@ -0,0 +1,84 @@
+import os
+import re
+
+from utils.tokens import estimate_tokens
+
+# Lines kept when a file is reduced to an outline.
+OUTLINE_RE = re.compile(
+    r"^\s*(?:(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:def|class|function|interface|struct|enum|trait|impl|type|func|fn|module)\b"
+    r"|(?:public|private|protected|static)\s[^=;]*\(|#{1,3}\s)"
+)
+MAX_OUTLINE_LINES = 60
+WORD_RE = re.compile(r"[A-Za-z0-9_./-]+")
+
+
+def file_block(path, content, outline=False):
+    """Format one file the way it is sent to the model."""
+    label = f"File: {path} (outline only)" if outline else f"File: {path}"
+    return f"{label}\n```\n{content}\n```\n\n"
+
+
+def outline(content):
+    """Reduce a file to its declaration lines, or None if it has none."""
+    lines = [line.rstrip() for line in content.splitlines() if OUTLINE_RE.match(line)]
+    if not lines:
+        return None
+    if len(lines) > MAX_OUTLINE_LINES:
+        lines = lines[:MAX_OUTLINE_LINES] + [f"... ({len(lines) - MAX_OUTLINE_LINES} more)"]
+    return "\n".join(lines)
+
+
+def rank_files(files, base_path, query=""):
+    """Order context files by relevance: referenced in the query, recently modified, small and shallow."""
+    words = set(WORD_RE.findall(query.lower()))
+    mtimes = {}
+    for file in files:
+        try:
+            mtimes[file["path"]] = os.stat(os.path.join(base_path, file["path"])).st_mtime
+        except OSError:
+            mtimes[file["path"]] = 0
+    by_recency = sorted(files, key=lambda f: mtimes[f["path"]], reverse=True)
+    recency = {f["path"]: 1 - i / len(files) for i, f in enumerate(by_recency)}
+
+    def score(file):
+        path = file["path"].replace(os.sep, "/").lower()
+        name = path.rsplit("/", 1)[-1]
+        stem = name.rsplit(".", 1)[0]
+        referenced = path in words or name in words or (len(stem) > 2 and stem in words)
+        size = 1 / (1 + len(file["content"]) / 4000)
+        proximity = 1 / (1 + path.count("/"))
+        return 3 * referenced + recency[file["path"]] + size + proximity
+
+    return sorted(files, key=lambda f: (-score(f), f["path"]))
+
+
+def pack_context(files, budget, base_path=".", query=""):
+    """Greedily fit ranked files into a token budget, outlining what does not fit.
+
+    Returns a dict with the packed "text", the estimated "tokens" used and
+    the paths sent in "full", as an "outlined" summary, or "dropped".
+    """
+    result = {"text": "", "tokens": 0, "full": [], "outlined": [], "dropped": []}
+    blocks = []
+    used = 0
+    for file in rank_files(files, base_path, query) if files else []:
+        block = file_block(file["path"], file["content"])
+        cost = estimate_tokens(block)
+        if used + cost <= budget:
+            blocks.append(block)
+            used += cost
+            result["full"].append(file["path"])
+            continue
+        summary = outline(file["content"])
+        if summary is not None:
+            block = file_block(file["path"], summary, outline=True)
+            cost = estimate_tokens(block)
+            if used + cost <= budget:
+                blocks.append(block)
+                used += cost
+                result["outlined"].append(file["path"])
+                continue
+        result["dropped"].append(file["path"])
+    result["text"] = "".join(blocks)
+    result["tokens"] = used
+    return result
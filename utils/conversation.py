@@ -0,0 +1,75 @@
+from utils.tokens import estimate_tokens
+
+# Approximate per-message overhead of the chat format (role and separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+# Command output that goes stale as the workspace changes; evicted first by "stale-first".
+STALE_KINDS = frozenset(["ls", "tree", "grep", "repo-map", "context", "context-delta"])
+POLICIES = ("stale-first", "oldest", "last-n")
+
+
+def message_tokens(message):
+    """Estimate the tokens one message adds to a request."""
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def conversation_tokens(messages):
+    return sum(message_tokens(message) for message in messages)
+
+
+def message_units(messages):
+    """Group messages into evictable units: a user message and the assistant replies that follow it.
+
+    System messages are pinned and never part of a unit. Returns lists of
+    indexes into `messages`.
+    """
+    units = []
+    for i, message in enumerate(messages):
+        if message["role"] == "system":
+            continue
+        if message["role"] == "assistant" and units and units[-1][-1] == i - 1:
+            units[-1].append(i)
+        else:
+            units.append([i])
+    return units
+
+
+def describe(message):
+    """Short label for a message in eviction logs."""
+    kind = message.get("kind")
+    if kind:
+        return kind
+    text = " ".join(message["content"].split())
+    return f'{message["role"]} "{text[:40]}{"..." if len(text) > 40 else ""}"'
+
+
+def fit_to_budget(messages, budget, policy="stale-first", keep_last=4):
+    """Evict messages in place until the conversation fits in `budget` tokens.
+
+    System messages are pinned and the last `keep_last` units (a prompt
+    and its reply, or a command's output) are never evicted. Policies:
+      "stale-first"  drop command output (/ls, /tree, /context, ...) oldest
+                     first, then the oldest conversation turns
+      "oldest"       drop the oldest units regardless of kind
+      "last-n"       once over budget, drop everything but the last units
+    Returns the evicted messages, oldest first.
+    """
+    total = conversation_tokens(messages)
+    if total <= budget:
+        return []
+    units = message_units(messages)
+    evictable = units[:-keep_last] if keep_last > 0 else units
+    if policy in ("oldest", "last-n"):
+        order = evictable
+    else:
+        stale = [unit for unit in evictable if messages[unit[0]].get("kind") in STALE_KINDS]
+        order = stale + [unit for unit in evictable if messages[unit[0]].get("kind") not in STALE_KINDS]
+
+    doomed = set()
+    for unit in order:
+        if total <= budget and policy != "last-n":
+            break
+        doomed.update(unit)
+        total -= sum(message_tokens(messages[i]) for i in unit)
+    evicted = [messages[i] for i in sorted(doomed)]
+    messages[:] = [message for i, message in enumerate(messages) if i not in doomed]
+    return evicted
@@ -0,0 +1,122 @@
+import os
+import struct
+from collections import namedtuple
+
+IndexEntry = namedtuple("IndexEntry", "path mode size mtime_ns ino sha")
+
+_ENTRY_HEADER = struct.Struct(">10I")
+_REGULAR_FILE = 0o100000
+_FILE_TYPE_MASK = 0o170000
+_EXTENDED_FLAG = 0x4000
+_STAGE_MASK = 0x3000
+_SKIP_WORKTREE = 0x4000
+
+
+def find_git_dir(root):
+    """Return the git directory for a work tree root, following `.git` files."""
+    dot_git = os.path.join(root, ".git")
+    if os.path.isdir(dot_git):
+        return dot_git
+    try:
+        with open(dot_git, "r", encoding="utf-8") as f:
+            line = f.readline().strip()
+    except OSError:
+        return None
+    if line.startswith("gitdir:"):
+        return os.path.normpath(os.path.join(root, line[len("gitdir:"):].strip()))
+    return None
+
+
+def _hash_size(git_dir):
+    try:
+        with open(os.path.join(git_dir, "config"), "r", encoding="utf-8") as f:
+            config = f.read().lower()
+    except OSError:
+        return 20
+    return 32 if "objectformat = sha256" in config else 20
+
+
+def _read_varint(data, pos):
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7f
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7f)
+    return value, pos
+
+
+def parse_index(data, hash_size=20):
+    """Parse the bytes of a git index (versions 2-4) into a list of IndexEntry.
+
+    Returns None for indexes this parser does not fully understand (split or
+    sparse indexes), so callers can fall back to walking the directory.
+    Only stage-0 regular files not marked skip-worktree are returned; whether
+    they still exist in the work tree is not checked.
+    """
+    if data[:4] != b"DIRC":
+        return None
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in (2, 3, 4):
+        return None
+
+    entries = []
+    pos = 12
+    previous = b""
+    for _ in range(count):
+        start = pos
+        (_, _, mtime_s, mtime_ns, _, ino, mode, _, _, size) = _ENTRY_HEADER.unpack_from(data, pos)
+        pos += 40
+        sha = data[pos:pos + hash_size].hex()
+        pos += hash_size
+        (flags,) = struct.unpack_from(">H", data, pos)
+        pos += 2
+        extended = 0
+        if flags & _EXTENDED_FLAG and version >= 3:
+            (extended,) = struct.unpack_from(">H", data, pos)
+            pos += 2
+
+        if version == 4:
+            strip, pos = _read_varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = previous[:len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            path = data[pos:end]
+            # Entries are NUL-padded to a multiple of eight bytes.
+            pos = start + ((end - start) // 8 + 1) * 8
+        previous = path
+
+        if mode & _FILE_TYPE_MASK == 0o040000:
+            return None  # sparse index directory entry
+        if (mode & _FILE_TYPE_MASK != _REGULAR_FILE or flags & _STAGE_MASK
+                or extended & _SKIP_WORKTREE):
+            continue
+        entries.append(IndexEntry(
+            path.decode("utf-8", "surrogateescape"), mode, size,
+            mtime_s * 1000000000 + mtime_ns, ino, sha
+        ))
+
+    # Extensions follow the entries; a split index keeps most entries elsewhere.
+    while pos + 8 <= len(data) - hash_size:
+        signature = data[pos:pos + 4]
+        (length,) = struct.unpack_from(">I", data, pos + 4)
+        if signature == b"link":
+            return None
+        pos += 8 + length
+    return entries
+
+
+def read_git_index(root):
+    """Return the tracked files of the git work tree at `root`, or None if unavailable."""
+    git_dir = find_git_dir(root)
+    if not git_dir:
+        return None
+    try:
+        with open(os.path.join(git_dir, "index"), "rb") as f:
+            data = f.read()
+        return parse_index(data, _hash_size(git_dir))
+    except (OSError, struct.error, ValueError, IndexError):
+        return None
@@ -0,0 +1,245 @@
+import os
+import re
+
+# POSIX character classes allowed inside gitignore bracket expressions, as regex class bodies.
+POSIX_CLASSES = {
+    "alnum": "a-zA-Z0-9",
+    "alpha": "a-zA-Z",
+    "blank": " \\t",
+    "cntrl": "\\x00-\\x1f\\x7f",
+    "digit": "0-9",
+    "graph": "\\x21-\\x7e",
+    "lower": "a-z",
+    "print": "\\x20-\\x7e",
+    "punct": "!-/:-@\\[-`{-~",
+    "space": " \\t\\n\\r\\f\\v",
+    "upper": "A-Z",
+    "xdigit": "0-9a-fA-F",
+}
+
+
+def _translate_class(glob, i):
+    """Translate the bracket expression opening at glob[i].
+
+    Returns (regex_fragment, index_of_closing_bracket), or None if it is
+    empty, unterminated or names an unknown [:class:].
+    """
+    n = len(glob)
+    j = i + 1
+    negate = j < n and glob[j] in "!^"
+    if negate:
+        j += 1
+    body = []
+    first = True
+    while j < n:
+        c = glob[j]
+        if c == "]" and not first:
+            return "(?!/)[" + ("^" if negate else "") + "".join(body) + "]", j
+        first = False
+        if glob.startswith("[:", j):
+            end = glob.find(":]", j + 2)
+            if end != -1:
+                name = glob[j + 2:end]
+                if name not in POSIX_CLASSES:
+                    return None
+                body.append(POSIX_CLASSES[name])
+                j = end + 2
+                continue
+        if c == "\\" and j + 1 < n:
+            j += 1
+            c = glob[j]
+        # "-" stays bare for ranges; anything Python could read as a nested set or set operation is escaped
+        if c in "\\[]^&~|" or (c == "-" and body and body[-1].endswith("-")):
+            c = "\\" + c
+        body.append(c)
+        j += 1
+    return None
+
+
+def _translate_glob(glob):
+    """Translate the body of a gitignore pattern into a regex fragment."""
+    out = []
+    i, n = 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if c == "*":
+            if glob.startswith("**", i):
+                at_start = i == 0 or glob[i - 1] == "/"
+                if at_start and glob.startswith("**/", i):
+                    out.append("(?:.*/)?")
+                    i += 3
+                    continue
+                if at_start and i + 2 == n:
+                    out.append(".+")
+                    i += 2
+                    continue
+                i += 2
+                while i < n and glob[i] == "*":
+                    i += 1
+                out.append("[^/]*")
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            translated = _translate_class(glob, i)
+            if translated is None:
+                # An empty or unterminated class is a literal "["
+                out.append(re.escape(c))
+            else:
+                fragment, i = translated
+                out.append(fragment)
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(glob[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def parse_pattern(line, base=""):
+    """Parse one gitignore line into (regex, negate), or None for blanks, comments and invalid patterns.
+
+    `base` is the directory of the ignore file relative to the matcher root,
+    with a trailing slash (or "" for the root). The regex is matched against
+    root-relative paths that carry a trailing "/" when they name a directory.
+    """
+    line = line.rstrip("\n\r")
+    if not line or line.startswith("#"):
+        return None
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+    if not line:
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith(("\\!", "\\#")):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    anchored = "/" in line
+    if line.startswith("**/"):
+        anchored = False
+        line = line[3:]
+    line = line.lstrip("/")
+    prefix = re.escape(base) + ("" if anchored else "(?:.*/)?")
+    suffix = "/" if dir_only else "/?"
+    regex = prefix + _translate_glob(line) + suffix
+    try:
+        re.compile(regex)
+    except re.error:
+        # Skip a rule we cannot translate rather than failing the whole directory
+        return None
+    return regex, negate
+
+
+class _CompiledRules:
+    """All rules that apply inside one directory, compiled into a single regex."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        # Later rules take precedence, so try them first; the matching
+        # alternative's group number tells us which rule won.
+        ordered = list(reversed(rules))
+        self.negations = [negate for _, negate in ordered]
+        self.regex = re.compile(
+            "(?:" + "|".join(f"({regex})" for regex, _ in ordered) + r")\Z"
+        ) if ordered else None
+
+    def matches(self, rel_path):
+        if self.regex is None:
+            return False
+        m = self.regex.match(rel_path)
+        return bool(m) and not self.negations[m.lastindex - 1]
+
+
+def compile_patterns(patterns):
+    """Compile standalone gitignore-style patterns; use `.matches(rel_path)` to test."""
+    return _CompiledRules([rule for rule in (parse_pattern(p) for p in patterns) if rule])
+
+
+class IgnoreMatcher:
+    """Gitignore matcher for a workspace root, including nested .gitignore files.
+
+    Rules are collected from `extra_patterns` (lowest precedence),
+    .git/info/exclude and every .gitignore from the root down to the
+    directory being examined, and compiled once per directory. Callers are
+    expected to prune ignored directories while walking, which gives git's
+    "a file inside an excluded directory cannot be re-included" behaviour.
+    """
+
+    def __init__(self, root, extra_patterns=()):
+        self.root = os.path.abspath(root)
+        self._compiled = {}
+        rules = [rule for rule in (parse_pattern(p) for p in extra_patterns) if rule]
+        rules += self._read_rules(os.path.join(self.root, ".git", "info", "exclude"), "")
+        self._base_rules = rules
+
+    @staticmethod
+    def _read_rules(path, base):
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return []
+        return [rule for rule in (parse_pattern(line, base) for line in lines) if rule]
+
+    def relpath(self, path):
+        """Return `path` relative to the matcher root with "/" separators."""
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        return "" if rel == "." else rel.replace(os.sep, "/")
+
+    def rules_for(self, rel_dir):
+        """Return the compiled rules that apply to entries of `rel_dir`."""
+        compiled = self._compiled.get(rel_dir)
+        if compiled is None:
+            if rel_dir:
+                parent = self.rules_for(rel_dir.rpartition("/")[0])
+                own = self._read_rules(os.path.join(self.root, rel_dir, ".gitignore"), rel_dir + "/")
+                compiled = _CompiledRules(parent.rules + own) if own else parent
+            else:
+                own = self._read_rules(os.path.join(self.root, ".gitignore"), "")
+                compiled = _CompiledRules(self._base_rules + own)
+            self._compiled[rel_dir] = compiled
+        return compiled
+
+    def is_ignored(self, rel_path, is_dir=False):
+        """Check a root-relative "/"-separated path against the applicable rules."""
+        rel_dir = rel_path.rpartition("/")[0]
+        return self.rules_for(rel_dir).matches(rel_path + "/" if is_dir else rel_path)
+
+    def is_path_ignored(self, path, is_dir=None):
+        """Check a filesystem path, including whether any parent directory is ignored."""
+        rel = self.relpath(path)
+        if not rel or rel.startswith(".."):
+            return False
+        if is_dir is None:
+            is_dir = os.path.isdir(path)
+        parts = rel.split("/")
+        for i in range(1, len(parts)):
+            if self.is_ignored("/".join(parts[:i]), True):
+                return True
+        return self.is_ignored(rel, is_dir)
+
+
+def find_ignore_root(path):
+    """Return the enclosing git work tree of `path`, or the current directory."""
+    current = os.path.abspath(path)
+    if not os.path.isdir(current):
+        current = os.path.dirname(current)
+    probe = current
+    while True:
+        if os.path.exists(os.path.join(probe, ".git")):
+            return probe
+        parent = os.path.dirname(probe)
+        if parent == probe:
+            break
+        probe = parent
+    cwd = os.getcwd()
+    if current == cwd or current.startswith(os.path.join(cwd, "")):
+        return cwd
+    return current
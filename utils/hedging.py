@@ -0,0 +1,100 @@
+import asyncio
+from collections import deque
+
+from utils.batch import percentile
+
+# Seconds to wait for a first token before hedging, until enough TTFTs have been observed.
+DEFAULT_HEDGE_DELAY = 2.0
+# Observed TTFTs needed before their percentile is trusted as the hedge delay.
+MIN_SAMPLES = 10
+
+
+class TtftTracker:
+    """Recent time-to-first-token samples, used to pick the hedge delay."""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def delay(self, p=90):
+        """The p-th percentile of recent TTFTs, or DEFAULT_HEDGE_DELAY with too few samples."""
+        if len(self.samples) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return percentile(list(self.samples), p)
+
+
+async def hedged(primary, hedge, on_delta, delay):
+    """Stream `primary(on_delta)`, and also `hedge(on_delta)` if no token arrives within `delay` seconds.
+
+    Both arguments are callables taking a delta callback and returning a
+    coroutine (e.g. a stream_chat call). Whichever request produces a token
+    first wins: only its deltas reach `on_delta` and the other is cancelled,
+    which closes its stream. A failure before the hedge fires is raised as
+    is; after that, the request still running carries on. Returns
+    (result, info) where info holds "hedged", "winner" ("primary" or
+    "hedge"), "ttft", the winner's time to first token from its own start,
+    and "first_token", the time from the primary's start.
+    """
+    loop = asyncio.get_running_loop()
+    first_token = asyncio.Event()
+    winner = None
+    tasks = []
+    started = []
+    ttft = None
+
+    def writer(index):
+        def write(text):
+            nonlocal winner, ttft
+            if winner is None:
+                winner = index
+                ttft = loop.time() - started[index]
+                first_token.set()
+                for other, task in enumerate(tasks):
+                    if other != index:
+                        task.cancel()
+            if winner == index:
+                on_delta(text)
+        return write
+
+    def start(request):
+        started.append(loop.time())
+        tasks.append(asyncio.ensure_future(request(writer(len(tasks)))))
+
+    start(primary)
+    token_wait = asyncio.ensure_future(first_token.wait())
+    deadline = loop.time() + delay
+    try:
+        while winner is None:
+            succeeded = [task for task in tasks if task.done() and not task.cancelled() and task.exception() is None]
+            if succeeded:
+                # Finished without producing any text (an empty reply)
+                winner = tasks.index(succeeded[0])
+                break
+            running = [task for task in tasks if not task.done()]
+            if not running:
+                raise tasks[-1].exception()
+            timeout = max(0.0, deadline - loop.time()) if len(tasks) == 1 else None
+            done, _ = await asyncio.wait(running + [token_wait], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done and len(tasks) == 1:
+                start(hedge)
+        for index, task in enumerate(tasks):
+            if index != winner:
+                task.cancel()
+        result = await tasks[winner]
+    finally:
+        token_wait.cancel()
+        for task in tasks:
+            task.cancel()
+        # Let cancelled streams close their connections before returning
+        await asyncio.gather(*tasks, token_wait, return_exceptions=True)
+    if ttft is None:
+        ttft = loop.time() - started[winner]
+    info = {
+        "hedged": len(tasks) > 1,
+        "winner": "hedge" if winner == 1 else "primary",
+        "ttft": ttft,
+        "first_token": started[winner] - started[0] + ttft
+    }
+    return result, info
@@ -0,0 +1,45 @@
+# Workspace context kept in the shared prefix, right after the system prompt.
+PINNED_KINDS = frozenset(["context", "repo-map"])
+# Command output and per-request material, sent after the conversation.
+VOLATILE_KINDS = frozenset(["ls", "tree", "grep", "context-delta", "retrieval"])
+
+
+def assemble(messages, environment=None):
+    """Order a conversation for a request so consecutive requests share the longest prefix.
+
+    Providers cache and discount a request's leading tokens when they match
+    an earlier request byte for byte. The layout is:
+      system prompt, pinned workspace context (/context, /map),
+      conversation turns, volatile content (/ls, /tree, /grep, context
+      deltas, retrieved excerpts, then `environment` as a system note),
+      the prompt being answered.
+    Relative order is kept within each group. Returns {"role", "content"}
+    dicts ready to send.
+    """
+    system, pinned, turns, volatile = [], [], [], []
+    for message in messages:
+        kind = message.get("kind")
+        if message["role"] == "system":
+            system.append(message)
+        elif kind in PINNED_KINDS:
+            pinned.append(message)
+        elif kind in VOLATILE_KINDS:
+            volatile.append(message)
+        else:
+            turns.append(message)
+    prompt = [turns.pop()] if turns and turns[-1]["role"] == "user" else []
+    if environment:
+        volatile.append({"role": "system", "content": environment})
+    return [
+        {"role": message["role"], "content": message["content"]}
+        for message in system + pinned + turns + volatile + prompt
+    ]
+
+
+def cached_tokens(usage):
+    """Return (prompt_tokens, cached_tokens) from a usage object, or None if it has no prompt count."""
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    if prompt_tokens is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return prompt_tokens, getattr(details, "cached_tokens", None) or 0
@@ -0,0 +1,85 @@
+import sys
+import time
+import asyncio
+import threading
+
+# Pending text is written at most once per frame, or sooner once this much has built up.
+FRAME_INTERVAL = 0.016
+FRAME_BYTES = 4096
+
+
+class StreamRenderer:
+    """Accumulates a streamed reply and writes it to the terminal in frames.
+
+    Deltas are kept in a list and joined once, so accumulation stays linear.
+    On a TTY, output is coalesced into at most one write and flush per
+    FRAME_INTERVAL (or FRAME_BYTES of pending text) instead of one per
+    delta; when called on an event loop, a timer flushes any pending text if
+    the stream goes quiet. Other outputs (pipes, files) get each delta
+    written and flushed as it arrives.
+    """
+
+    def __init__(self, out=None, interval=FRAME_INTERVAL, max_pending=FRAME_BYTES, buffered=None):
+        self.out = out or sys.stdout
+        if buffered is None:
+            isatty = getattr(self.out, "isatty", None)
+            buffered = bool(isatty and isatty())
+        self.buffered = buffered
+        self.interval = interval
+        self.max_pending = max_pending
+        self.writes = 0
+        self._parts = []
+        self._pending = []
+        self._pending_len = 0
+        self._last_flush = 0.0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    @property
+    def started(self):
+        """Whether any text has been written (and so may already be on screen)."""
+        return any(self._parts)
+
+    def write(self, text):
+        self._parts.append(text)
+        if not self.buffered:
+            self.out.write(text)
+            self.out.flush()
+            self.writes += 1
+            return
+        with self._lock:
+            self._pending.append(text)
+            self._pending_len += len(text)
+            since = time.monotonic() - self._last_flush
+            if self._pending_len < self.max_pending and since < self.interval:
+                if self._timer is None:
+                    try:
+                        loop = asyncio.get_running_loop()
+                    except RuntimeError:
+                        return
+                    self._timer = loop.call_later(self.interval - since, self.flush)
+                return
+        self.flush()
+
+    def flush(self):
+        """Write any pending text now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending:
+                self.out.write("".join(self._pending))
+                self.out.flush()
+                self.writes += 1
+                self._pending = []
+                self._pending_len = 0
+            self._last_flush = time.monotonic()
+
+    def finish(self):
+        """Flush the last frame and return the full text."""
+        self.flush()
+        return self.text
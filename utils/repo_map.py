@@ -0,0 +1,146 @@
+import os
+import ast
+import hashlib
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+CACHE_PATH = os.path.expanduser("~/.llm_code_cache/repo_map.sqlite3")
+# Bump when the outline format changes so cached outlines are rebuilt.
+OUTLINE_VERSION = "1"
+# Parse in a process pool only when this many files are not cached yet.
+PROCESS_POOL_THRESHOLD = 64
+
+
+def _first_line(node):
+    doc = ast.get_docstring(node, clean=True)
+    return doc.strip().splitlines()[0] if doc and doc.strip() else ""
+
+
+def _signature(node):
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _outline_body(body, indent, lines):
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            doc = _first_line(node)
+            lines.append(f"{indent}{_signature(node)}" + (f"  # {doc}" if doc else ""))
+        elif isinstance(node, ast.ClassDef):
+            bases = [ast.unparse(base) for base in node.bases + node.keywords]
+            doc = _first_line(node)
+            lines.append(f"{indent}class {node.name}" + (f"({', '.join(bases)})" if bases else "") + ":"
+                         + (f"  # {doc}" if doc else ""))
+            _outline_body(node.body, indent + "    ", lines)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)) and not indent:
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = [t.id for t in targets if isinstance(t, ast.Name) and t.id.isupper()]
+            if names:
+                lines.append(f"{', '.join(names)} = ...")
+
+
+def outline_python(source):
+    """Return a compact outline of Python source: imports, classes, signatures and docstring first lines."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError) as e:
+        return f"(could not parse: {e.__class__.__name__} line {getattr(e, 'lineno', '?')})"
+    lines = []
+    imports = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            imports.append(f"{module}.{{{', '.join(alias.name for alias in node.names)}}}")
+    if imports:
+        lines.append("imports: " + ", ".join(imports))
+    doc = _first_line(tree)
+    if doc:
+        lines.insert(0, f"# {doc}")
+    _outline_body(tree.body, "", lines)
+    return "\n".join(lines)
+
+
+def _outline_many(sources):
+    return [outline_python(source) for source in sources]
+
+
+class _OutlineCache:
+    """Outlines keyed by content hash, shared across workspaces."""
+
+    def __init__(self, path=CACHE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS outlines (digest TEXT PRIMARY KEY, outline TEXT)")
+
+    def get_many(self, digests):
+        found = {}
+        unique = list(set(digests))
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            query = "SELECT digest, outline FROM outlines WHERE digest IN (%s)" % ",".join("?" * len(batch))
+            found.update(self.conn.execute(query, batch))
+        return found
+
+    def put_many(self, items):
+        self.conn.executemany("INSERT OR REPLACE INTO outlines (digest, outline) VALUES (?, ?)", items)
+
+    def close(self):
+        try:
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+
+def outline_files(files, workers=None):
+    """Outline the Python files among context `files` ({"path", "content"} dicts).
+
+    Returns ({path: outline}, stats). Outlines are looked up by content
+    hash first, so only new or edited files are parsed; when many files
+    miss the cache they are parsed in a process pool.
+    """
+    python_files = [file for file in files if file["path"].endswith((".py", ".pyi"))]
+    digests = [
+        hashlib.sha1((OUTLINE_VERSION + file["content"]).encode("utf-8", "surrogatepass")).hexdigest()
+        for file in python_files
+    ]
+    try:
+        cache = _OutlineCache()
+    except (sqlite3.Error, OSError):
+        cache = None
+    try:
+        known = cache.get_many(digests) if cache else {}
+        missing = [i for i, digest in enumerate(digests) if digest not in known]
+        sources = [python_files[i]["content"] for i in missing]
+        if len(missing) >= PROCESS_POOL_THRESHOLD and workers != 1:
+            chunk = max(1, len(sources) // ((workers or os.cpu_count() or 1) * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                outlines = list(pool.map(outline_python, sources, chunksize=chunk))
+        else:
+            outlines = _outline_many(sources)
+        for i, outline in zip(missing, outlines):
+            known[digests[i]] = outline
+        if cache and missing:
+            cache.put_many([(digests[i], known[digests[i]]) for i in missing])
+    finally:
+        if cache:
+            cache.close()
+    result = {file["path"]: known[digest] for file, digest in zip(python_files, digests)}
+    return result, {"python": len(python_files), "parsed": len(missing), "cached": len(python_files) - len(missing)}
+
+
+def build_repo_map(files, workers=None):
+    """Build a repo map: an outline per Python file followed by the other file names."""
+    outlines, stats = outline_files(files, workers)
+    parts = []
+    for file in files:
+        outline = outlines.get(file["path"])
+        if outline is not None:
+            body = "\n".join("  " + line for line in outline.splitlines()) if outline else "  (empty)"
+            parts.append(f"{file['path']}\n{body}\n")
+    others = [file["path"] for file in files if file["path"] not in outlines]
+    if others:
+        parts.append("Other files: " + ", ".join(others) + "\n")
+    return "\n".join(parts), stats
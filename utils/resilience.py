@@ -0,0 +1,164 @@
+import time
+import random
+import asyncio
+import email.utils
+
+import openai
+
+from utils.api_client import httpx
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors.
+RETRYABLE_STATUS = frozenset([408, 409, 429, 500, 502, 503, 504])
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+def status_of(exc):
+    return getattr(exc, "status_code", None)
+
+
+def is_connection_error(exc):
+    return isinstance(exc, (openai.APIConnectionError, httpx.TransportError))
+
+
+def is_retryable(exc):
+    return is_connection_error(exc) or status_of(exc) in RETRYABLE_STATUS
+
+
+def is_outage(exc):
+    """Whether `exc` suggests the endpoint is down (as opposed to rejecting this request)."""
+    return is_connection_error(exc) or (status_of(exc) or 0) >= 500
+
+
+def retry_after(exc):
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), or None."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """How often and how long to retry a failed request.
+
+    Delays grow exponentially from `base_delay` up to `max_delay` with full
+    jitter (a random delay between zero and the cap), unless the server
+    sends Retry-After. No more than `budget` seconds are spent waiting in
+    total for one request.
+    """
+
+    def __init__(self, retries=3, base_delay=0.5, max_delay=30.0, budget=60.0):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def delay(self, attempt, exc):
+        """Seconds to wait before retry number `attempt` (0-based) after `exc`."""
+        hinted = retry_after(exc)
+        if hinted is not None:
+            return hinted
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fails fast while the endpoint looks down.
+
+    After `threshold` consecutive outage errors (connection failures,
+    timeouts, 5xx) the circuit opens and requests fail immediately with
+    CircuitOpenError. After `cooldown` seconds one trial request is let
+    through (half-open); success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self._trial or time.monotonic() >= self.opened_at + self.cooldown else "open"
+
+    def check(self):
+        """Raise CircuitOpenError while open; returns True if this request is the half-open trial."""
+        if self.opened_at is None:
+            return False
+        wait = self.opened_at + self.cooldown - time.monotonic()
+        if wait > 0:
+            raise CircuitOpenError(f"API endpoint appears to be down; failing fast for another {wait:.0f}s")
+        if self._trial:
+            raise CircuitOpenError("API endpoint appears to be down; waiting for a trial request")
+        self._trial = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def release_trial(self):
+        """Give up a trial request that was cancelled; the circuit stays as it was."""
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold or self._trial:
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+
+async def call_with_retries(attempt, policy, breaker=None, emitted=None, on_retry=None):
+    """Await `attempt()` until it succeeds, retrying transient failures under `policy`.
+
+    A failure is retried only if it is retryable, retries and the waiting
+    budget remain, and `emitted()` (when given) reports that no output has
+    reached the user yet; otherwise a retry would repeat it. `on_retry` is
+    called with (retry_number, delay, exc) before each wait.
+    """
+    waited = 0.0
+    for number in range(policy.retries + 1):
+        trial = breaker.check() if breaker else False
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            if trial:
+                # A cancelled trial proves nothing; let the next request try again
+                breaker.release_trial()
+            raise
+        except Exception as e:
+            if breaker:
+                if is_outage(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if number == policy.retries or not is_retryable(e) or (emitted and emitted()):
+                raise
+            delay = policy.delay(number, e)
+            if waited + delay > policy.budget:
+                raise
+            waited += delay
+            if on_retry:
+                on_retry(number + 1, delay, e)
+            await asyncio.sleep(delay)
+        else:
+            if breaker:
+                breaker.record_success()
+            return result
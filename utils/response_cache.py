@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+CACHE_PATH = os.path.expanduser("~/.llm_code_cache/responses.sqlite3")
+
+
+def request_key(model, temperature, messages):
+    """Hash a request: the model, temperature and the exact messages sent."""
+    payload = json.dumps(
+        {"model": model, "temperature": float(temperature), "messages": messages},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class ResponseCache:
+    """Replies to previous requests, stored in SQLite and evicted least-recently-used.
+
+    Keyed by request_key(); once the stored replies exceed `max_bytes`,
+    the ones used longest ago are removed.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, size INTEGER, "
+            "created REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+
+    def get(self, key):
+        """Return the cached reply for `key`, or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key, response):
+        with self._lock:
+            now = time.time()
+            size = len(response.encode("utf-8", "surrogatepass"))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT coalesce(sum(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def stats(self):
+        with self._lock:
+            entries, size, hits = self.conn.execute(
+                "SELECT count(*), coalesce(sum(size), 0), coalesce(sum(hits), 0) FROM responses"
+            ).fetchone()
+        return {
+            "entries": entries, "bytes": size, "max_bytes": self.max_bytes, "total_hits": hits,
+            "session_hits": self.hits, "session_misses": self.misses, "path": self.path,
+        }
+
+    def clear(self):
+        with self._lock:
+            removed = self.conn.execute("DELETE FROM responses").rowcount
+            self.conn.commit()
+            self.conn.execute("VACUUM")
+        return removed
+
+    def close(self):
+        self.conn.close()
+
+
+def open_response_cache(max_bytes):
+    """Open the response cache, or None if it cannot be used."""
+    try:
+        return ResponseCache(max_bytes=max_bytes)
+    except (sqlite3.Error, OSError):
+        return None
@@ -0,0 +1,119 @@
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+
+import openai
+
+from utils.api_client import httpx
+from utils.tokens import estimate_tokens
+
+# Config keys (and defaults) for the debug-mode simulator; changing any of them rebuilds it.
+SIMULATOR_OPTIONS = {
+    "simTtft": 0.5,
+    "simTokensPerSecond": 50.0,
+    "simJitter": 0.2,
+    "simOutputTokens": 200,
+    "simErrorRate": 0.0,
+    "simDropRate": 0.0,
+    "simSeed": 0,
+}
+
+DEBUG_RESPONSE = "DEBUG MODE: This is a simulated response. Set debug=false to use actual API."
+FILLER_WORDS = (
+    "the function returns a value when the input is valid and otherwise raises an error so callers "
+    "can handle missing files parse config options and retry requests after a short delay"
+).split()
+
+
+class SimulatedStream:
+    """Async iterator of chat.completion.chunk-like objects, like the SDK's AsyncStream."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._chunks
+
+    async def close(self):
+        await self._chunks.aclose()
+
+
+class SimulatedClient:
+    """Stands in for AsyncOpenAI in debug mode, generating replies locally.
+
+    Only chat.completions.create() is provided, streaming or not, so
+    stream_chat, retries, hedging and the renderer run unchanged. Replies
+    are `simOutputTokens` words after `simTtft` seconds, at
+    `simTokensPerSecond` (0 for no delay); every delay is scaled by a lognormal factor with
+    sigma `simJitter`. A `simErrorRate` share of requests fail with HTTP
+    503 before the first token and a `simDropRate` share lose their
+    connection part-way through. A fixed `simSeed` makes runs repeatable.
+    """
+
+    def __init__(self, settings):
+        self.settings = dict(settings)
+        self.rng = random.Random(settings["simSeed"])
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _delay(self, seconds):
+        jitter = self.settings["simJitter"]
+        return seconds * self.rng.lognormvariate(0, jitter) if jitter > 0 else seconds
+
+    def _interval(self):
+        rate = self.settings["simTokensPerSecond"]
+        return 1 / rate if rate > 0 else 0.0
+
+    def _words(self):
+        count = max(1, self.settings["simOutputTokens"])
+        words = DEBUG_RESPONSE.split()
+        words += [self.rng.choice(FILLER_WORDS) for _ in range(count - len(words))]
+        return [word if i == 0 else " " + word for i, word in enumerate(words[:count])]
+
+    def _server_error(self):
+        request = httpx.Request("POST", "http://simulator/v1/chat/completions")
+        response = httpx.Response(503, request=request)
+        return openai.InternalServerError("Simulated server error", response=response, body=None)
+
+    async def create(self, model, messages, stream=False, stream_options=None, **_):
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        failed = self.rng.random() < self.settings["simErrorRate"]
+        drop_at = None
+        words = self._words()
+        if self.rng.random() < self.settings["simDropRate"]:
+            drop_at = self.rng.randrange(len(words))
+        ttft = self._delay(self.settings["simTtft"])
+        if failed:
+            await asyncio.sleep(ttft)
+            raise self._server_error()
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=len(words),
+            total_tokens=prompt_tokens + len(words),
+            prompt_tokens_details=None,
+        )
+        if not stream:
+            await asyncio.sleep(ttft + self._delay(len(words) * self._interval()))
+            message = SimpleNamespace(role="assistant", content="".join(words))
+            return SimpleNamespace(
+                model=model, created=int(time.time()), usage=usage,
+                choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            )
+        include_usage = bool((stream_options or {}).get("include_usage"))
+        return SimulatedStream(self._chunks(model, words, ttft, drop_at, usage if include_usage else None))
+
+    async def _chunks(self, model, words, ttft, drop_at, usage):
+        await asyncio.sleep(ttft)
+        interval = self._interval()
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self._delay(interval))
+            if i == drop_at:
+                raise httpx.RemoteProtocolError("Simulated connection drop")
+            delta = SimpleNamespace(role="assistant" if i == 0 else None, content=word)
+            yield SimpleNamespace(
+                model=model, usage=None,
+                choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)],
+            )
+        if usage is not None:
+            yield SimpleNamespace(model=model, usage=usage, choices=[])
@@ -0,0 +1,8 @@
+# Rough chars-per-token ratio for English text and source code with
+# OpenAI-style BPE tokenizers; good enough for budgeting without tiktoken.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in `text`."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
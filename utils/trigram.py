@@ -0,0 +1,161 @@
+import os
+import hashlib
+import sqlite3
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from utils.workspace import read_text_file
+
+CACHE_DIR = os.path.expanduser("~/.llm_code_cache/trigram")
+SCHEMA_VERSION = 1
+
+
+def index_path_for(root):
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{digest}.sqlite3")
+
+
+def _required(parsed):
+    """Return the literals any match of a parsed regex must contain.
+
+    The result is a query tree of ("lit", text), ("and", [...]) and
+    ("or", [...]) nodes, or None when nothing can be required (the regex
+    could match without any literal of three or more characters).
+    """
+    items = []
+    run = []
+
+    def flush():
+        if len(run) >= 3:
+            items.append(("lit", "".join(run)))
+        run.clear()
+
+    for op, av in parsed:
+        name = str(op)
+        if name == "LITERAL":
+            run.append(chr(av))
+            continue
+        flush()
+        if name == "SUBPATTERN":
+            sub = _required(av[-1])
+        elif name == "ATOMIC_GROUP":
+            sub = _required(av)
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            low, _, body = av
+            sub = _required(body) if low >= 1 else None
+        elif name == "BRANCH":
+            branches = [_required(branch) for branch in av[1]]
+            sub = ("or", branches) if all(branches) else None
+        else:
+            sub = None
+        if sub:
+            items.append(sub)
+    flush()
+    if not items:
+        return None
+    return items[0] if len(items) == 1 else ("and", items)
+
+
+def _to_match(node):
+    kind, value = node
+    if kind == "lit":
+        return '"' + value.replace('"', '""') + '"'
+    joiner = " AND " if kind == "and" else " OR "
+    return "(" + joiner.join(_to_match(child) for child in value) + ")"
+
+
+def trigram_query(pattern):
+    """Translate a regex into an FTS5 trigram MATCH expression, or None to scan every file."""
+    try:
+        tree = _required(sre_parse.parse(pattern))
+    except Exception:
+        return None
+    return _to_match(tree) if tree else None
+
+
+class TrigramIndex:
+    """Persistent trigram index of workspace file contents for /grep.
+
+    Backed by an SQLite FTS5 table with the trigram tokenizer. A regex is
+    reduced to the literals every match must contain, and only files
+    containing all of their trigrams are scanned with the regex. Files are
+    re-read only when their size or mtime changes.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.db_path = index_path_for(self.root)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS files")
+            self.conn.execute("DROP TABLE IF EXISTS docs")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, doc INTEGER)")
+        self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(path UNINDEXED, content, tokenize = 'trigram')")
+        self.conn.commit()
+
+    def refresh(self, file_paths, max_bytes=None):
+        """Sync the index with `file_paths` (absolute), reading only files whose stat changed."""
+        known = {path: (size, mtime, doc) for path, size, mtime, doc in
+                 self.conn.execute("SELECT path, size, mtime_ns, doc FROM files")}
+        seen = set()
+        updated = 0
+        for path in file_paths:
+            seen.add(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            old = known.get(path)
+            if old and old[:2] == (st.st_size, st.st_mtime_ns):
+                continue
+            if old and old[2] is not None:
+                self.conn.execute("DELETE FROM docs WHERE rowid = ?", (old[2],))
+            content, _ = read_text_file(path, max_bytes)
+            doc = None
+            if content is not None:
+                doc = self.conn.execute("INSERT INTO docs (path, content) VALUES (?, ?)", (path, content)).lastrowid
+            # Binary and oversized files are recorded without a document so they are not re-read.
+            self.conn.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, doc) VALUES (?, ?, ?, ?)",
+                              (path, st.st_size, st.st_mtime_ns, doc))
+            updated += 1
+        for path in set(known) - seen:
+            if known[path][2] is not None:
+                self.conn.execute("DELETE FROM docs WHERE rowid = ?", (known[path][2],))
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.conn.commit()
+        return updated
+
+    def candidates(self, pattern, under=None):
+        """Yield (path, content) for indexed files that may match `pattern`, sorted by path."""
+        query = trigram_query(pattern)
+        if query:
+            rows = self.conn.execute("SELECT path, content FROM docs WHERE docs MATCH ? ORDER BY path", (query,))
+        else:
+            rows = self.conn.execute("SELECT path, content FROM docs ORDER BY path")
+        prefix = os.path.join(os.path.abspath(under), "") if under else None
+        for path, content in rows:
+            if prefix is None or path.startswith(prefix):
+                yield path, content
+
+    def search(self, regex, under=None):
+        """Yield (path, line_number, line) for every line matching the compiled `regex`."""
+        for path, content in self.candidates(regex.pattern, under):
+            for number, line in enumerate(content.splitlines(), 1):
+                if regex.search(line):
+                    yield path, number, line
+
+    def close(self):
+        self.conn.close()
+
+
+def open_index(root):
+    """Open the trigram index for `root`, or None if SQLite lacks the trigram tokenizer."""
+    try:
+        return TrigramIndex(root)
+    except (sqlite3.Error, OSError):
+        return None
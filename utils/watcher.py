@@ -0,0 +1,306 @@
+import os
+import errno
+import select
+import struct
+import threading
+
+from utils.gitignore import IgnoreMatcher
+from utils.workspace import read_files, walk_tree
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+
+# Wait this long after the last event before applying a batch of changes.
+DEBOUNCE_SECONDS = 0.1
+# Bursts touching more paths than this (e.g. git checkout) trigger one full rescan.
+BURST_LIMIT = 2000
+
+
+class _Inotify:
+    """Minimal ctypes binding for Linux inotify."""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._ctypes = ctypes
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read_events(self):
+        """Yield (wd, mask, name) for all queued events."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        pos = 0
+        while pos + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = data[pos:pos + length].rstrip(b"\0")
+            pos += length
+            yield wd, mask, os.fsdecode(name)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WorkspaceWatcher:
+    """Keeps an in-memory index of workspace file contents up to date.
+
+    A background thread watches the tree with inotify (on Linux) and
+    re-reads only the files that changed, so /context can be answered from
+    memory. Bursts of events are coalesced, and when inotify is unavailable
+    or runs out of watches the thread polls file stats instead.
+    """
+
+    def __init__(self, root, ignore_root=None, extra_patterns=(), max_bytes=None, workers=1, poll_interval=2.0):
+        self.root = os.path.abspath(root)
+        self.ignore_root = os.path.abspath(ignore_root or root)
+        self.extra_patterns = list(extra_patterns)
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.mode = None
+        self.ready = False
+        self.error = None
+        # A message for the user, shown by the prompt loop so it never overwrites the input line
+        self.notice = None
+        self._files = {}
+        self._stats = {}
+        self._matcher = None
+        self._lock = threading.RLock()
+        self._pending = set()
+        self._rebuild_pending = False
+        self._inotify = None
+        self._watches = {}
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="workspace-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        os.write(self._wake_w, b"x")
+        self._thread.join(timeout=2)
+        for fd in (self._wake_r, self._wake_w):
+            os.close(fd)
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def covers(self, path):
+        path = os.path.abspath(path)
+        return path == self.root or path.startswith(os.path.join(self.root, ""))
+
+    def snapshot(self, full_path):
+        """Return (context, skipped) for files under `full_path`, or None if not ready."""
+        if not self.ready or not self.covers(full_path):
+            return None
+        with self._lock:
+            self._flush()
+            prefix = os.path.join(os.path.abspath(full_path), "")
+            context, skipped = [], []
+            for path in sorted(self._files):
+                if not path.startswith(prefix):
+                    continue
+                rel_path = path[len(prefix):]
+                content, reason = self._files[path]
+                if content is not None:
+                    context.append({"path": rel_path, "content": content})
+                else:
+                    skipped.append({"path": rel_path, "reason": reason})
+            return context, skipped
+
+    # -- index maintenance -------------------------------------------------
+
+    def _scan(self, top):
+        """Walk `top` and return (file_paths, dir_paths) that are not ignored."""
+        files, dirs = [], [top]
+        for item in walk_tree(top, self._matcher):
+            if item.is_dir:
+                if not item.entry.is_symlink():
+                    dirs.append(item.path)
+            else:
+                files.append(item.path)
+        return files, dirs
+
+    def _read(self, paths):
+        results = read_files(paths, workers=self.workers, max_bytes=self.max_bytes)
+        for path, result in zip(paths, results):
+            self._files[path] = result
+            if self.mode == "polling":
+                self._stats[path] = self._stat_key(path)
+
+    @staticmethod
+    def _stat_key(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def _rebuild(self):
+        with self._lock:
+            self._matcher = IgnoreMatcher(self.ignore_root, self.extra_patterns)
+            self._files = {}
+            self._stats = {}
+            self._pending.clear()
+            self._rebuild_pending = False
+            files, dirs = self._scan(self.root)
+            if self.mode == "inotify":
+                self._add_watches(dirs)
+            self._read(files)
+
+    def _add_watches(self, dirs):
+        for path in dirs:
+            try:
+                self._watches[self._inotify.add_watch(path)] = path
+            except OSError as e:
+                # A vanished or unreadable directory is covered by its parent's events.
+                if e.errno == errno.ENOSPC:
+                    self._fall_back_to_polling()
+                    return
+
+    def _fall_back_to_polling(self):
+        self.notice = f"inotify watch limit reached, polling the workspace every {self.poll_interval}s"
+        self.mode = "polling"
+        self._watches.clear()
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+        self._rebuild_pending = True
+
+    def _flush(self):
+        """Apply queued changes to the index."""
+        if self._rebuild_pending:
+            self._rebuild()
+            return
+        pending, self._pending = self._pending, set()
+        reread = []
+        for path in sorted(pending):
+            if os.path.isdir(path) and not os.path.islink(path):
+                if self._matcher.is_path_ignored(path, True):
+                    continue
+                files, dirs = self._scan(path)
+                if self.mode == "inotify":
+                    self._add_watches(dirs)
+                reread.extend(files)
+            elif os.path.isfile(path) and not self._matcher.is_path_ignored(path, False):
+                reread.append(path)
+            else:
+                # Deleted (or now ignored): forget it and anything below it.
+                prefix = os.path.join(path, "")
+                for known in [p for p in self._files if p == path or p.startswith(prefix)]:
+                    del self._files[known]
+                    self._stats.pop(known, None)
+        self._read(sorted(set(reread)))
+
+    def _queue(self, path):
+        if os.path.basename(path) == ".gitignore":
+            self._rebuild_pending = True
+        self._pending.add(path)
+        if len(self._pending) > BURST_LIMIT:
+            self._rebuild_pending = True
+            self._pending.clear()
+
+    # -- background thread -------------------------------------------------
+
+    def _run(self):
+        try:
+            try:
+                self._inotify = _Inotify()
+                self.mode = "inotify"
+            except (OSError, AttributeError):
+                self.mode = "polling"
+            self._rebuild()
+            self.ready = True
+            while not self._stop.is_set():
+                if self.mode == "inotify":
+                    self._run_inotify_once()
+                else:
+                    self._poll_once()
+        except Exception as e:
+            self.error = str(e)
+            self.ready = False
+
+    def _run_inotify_once(self):
+        with self._lock:
+            has_pending = bool(self._pending) or self._rebuild_pending
+        timeout = DEBOUNCE_SECONDS if has_pending else None
+        readable, _, _ = select.select([self._inotify.fd, self._wake_r], [], [], timeout)
+        if self._stop.is_set():
+            return
+        if not readable:
+            # Quiet period after a burst: apply everything at once.
+            with self._lock:
+                self._flush()
+            return
+        with self._lock:
+            for wd, mask, name in self._inotify.read_events():
+                if mask & IN_Q_OVERFLOW:
+                    self._rebuild_pending = True
+                    continue
+                directory = self._watches.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    del self._watches[wd]
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    self._queue(directory)
+                    continue
+                self._queue(os.path.join(directory, name) if name else directory)
+
+    def _poll_once(self):
+        if self._stop.wait(self.poll_interval):
+            return
+        with self._lock:
+            matcher = self._matcher
+        current = {}
+        for item in walk_tree(self.root, matcher):
+            if not item.is_dir:
+                try:
+                    st = item.entry.stat()
+                except OSError:
+                    continue
+                current[item.path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        with self._lock:
+            for path in set(current) | set(self._stats):
+                if current.get(path) != self._stats.get(path):
+                    self._queue(path)
+            self._flush()
+
+
+def start_watcher(root, **options):
+    """Start a watcher for `root`, returning None if it could not be started."""
+    try:
+        return WorkspaceWatcher(root, **options).start()
+    except OSError:
+        return None
@@ -0,0 +1,195 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+WalkEntry = namedtuple("WalkEntry", "name path rel_path depth is_dir is_last entry")
+
+# Files handed to a worker per task; keeps pool overhead small on warm disks.
+READ_CHUNK_SIZE = 32
+
+
+def _scan_directory(path, rel_path, depth, matcher, rel_prefix):
+    """List one directory with a single os.scandir call, sorted directories first."""
+    items = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if matcher and matcher.is_ignored(rel_prefix + entry.name, is_dir):
+                continue
+            items.append((not is_dir, entry.name.lower(), entry.name, entry, is_dir))
+    items.sort(key=lambda item: item[:3])
+    last = len(items) - 1
+    return [
+        WalkEntry(name, entry.path, os.path.join(rel_path, name) if rel_path else name,
+                  depth, is_dir, i == last, entry)
+        for i, (_, _, name, entry, is_dir) in enumerate(items)
+    ]
+
+
+def walk_tree(top, matcher=None, max_depth=None):
+    """Iteratively walk `top` in pre-order, yielding a WalkEntry per file and directory.
+
+    Entry types come from the cached os.DirEntry data, so no extra stat
+    calls are made. Entries rejected by `matcher` are skipped and ignored
+    directories are not descended into; neither are symlinked directories.
+    Unreadable directories are silently skipped, as with os.walk.
+    """
+    top = os.path.abspath(top)
+    top_prefix = matcher.relpath(top) if matcher else ""
+    stack = []
+    try:
+        stack.append(iter(_scan_directory(top, "", 0, matcher, top_prefix + "/" if top_prefix else "")))
+    except OSError:
+        return
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+            continue
+        yield item
+        if item.is_dir and not item.entry.is_symlink() and (max_depth is None or item.depth < max_depth):
+            rel_prefix = (top_prefix + "/" if top_prefix else "") + item.rel_path.replace(os.sep, "/") + "/"
+            try:
+                stack.append(iter(_scan_directory(item.path, item.rel_path, item.depth + 1, matcher, rel_prefix)))
+            except OSError:
+                continue
+
+
+# Bytes inspected at the start of a file to decide whether it is text.
+SNIFF_BYTES = 8192
+
+BINARY_MAGIC = [
+    (b"\x89PNG\r\n\x1a\n", "PNG image"),
+    (b"\xff\xd8\xff", "JPEG image"),
+    (b"GIF8", "GIF image"),
+    (b"%PDF-", "PDF document"),
+    (b"PK\x03\x04", "zip archive"),
+    (b"\x1f\x8b", "gzip archive"),
+    (b"BZh", "bzip2 archive"),
+    (b"\xfd7zXZ\x00", "xz archive"),
+    (b"7z\xbc\xaf\x27\x1c", "7z archive"),
+    (b"\x28\xb5\x2f\xfd", "zstd archive"),
+    (b"\x7fELF", "ELF binary"),
+    (b"\xca\xfe\xba\xbe", "Java class or Mach-O binary"),
+    (b"\xcf\xfa\xed\xfe", "Mach-O binary"),
+    (b"\x00asm", "WebAssembly module"),
+    (b"SQLite format 3\x00", "SQLite database"),
+    (b"\x80\x02", "pickle"),
+    (b"\x93NUMPY", "NumPy array"),
+]
+
+
+def sniff_binary(head):
+    """Return a reason string if the leading bytes of a file look binary, else None."""
+    for magic, kind in BINARY_MAGIC:
+        if head.startswith(magic):
+            return kind
+    if b"\x00" in head:
+        return "binary (contains NUL bytes)"
+    return None
+
+
+def read_text_file(file_path, max_bytes=None):
+    """Read a UTF-8 text file without loading binaries or oversized files.
+
+    Returns (content, None) on success or (None, reason) when the file is
+    skipped. Size comes from fstat and binaries are rejected from the first
+    SNIFF_BYTES, so neither case reads the whole file.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if max_bytes and size > max_bytes:
+                return None, f"larger than {max_bytes} bytes ({size} bytes)"
+            head = f.read(SNIFF_BYTES)
+            reason = sniff_binary(head)
+            if reason:
+                return None, reason
+            data = head + f.read()
+    except OSError as e:
+        return None, f"unreadable ({e.strerror or e})"
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None, "not UTF-8 text"
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text, None
+
+
+def _cacheable(content, reason):
+    """Whether a read result depends only on the file's content, so it may be cached under its stat.
+
+    Size skips depend on `max_bytes` and read errors on permissions (a chmod
+    only changes ctime), so neither is cached.
+    """
+    return content is not None or not reason.startswith(("unreadable", "larger than"))
+
+
+def _read_chunk(file_paths, max_bytes):
+    return [read_text_file(file_path, max_bytes) for file_path in file_paths]
+
+
+def read_files(file_paths, cache=None, workers=1, max_bytes=None):
+    """Read files for the workspace context, overlapping I/O across a thread pool.
+
+    Returns a list of (content, skip_reason) pairs in the same order as
+    `file_paths`. Cache lookups and stores stay on the calling thread; only
+    the uncached reads go to the pool. Size-based skips and read errors are
+    never cached, so raising `max_bytes` or fixing permissions takes effect
+    immediately.
+    """
+    results = [(None, None)] * len(file_paths)
+    stats = {}
+    pending = []
+    for i, file_path in enumerate(file_paths):
+        if cache:
+            try:
+                st = os.stat(file_path)
+            except OSError as e:
+                results[i] = (None, f"unreadable ({e.strerror or e})")
+                continue
+            if max_bytes and st.st_size > max_bytes:
+                results[i] = (None, f"larger than {max_bytes} bytes ({st.st_size} bytes)")
+                continue
+            cached = cache.lookup(file_path, st)
+            if cached:
+                results[i] = cached
+                continue
+            stats[i] = st
+        pending.append(i)
+
+    if workers > 1 and len(pending) > READ_CHUNK_SIZE:
+        chunks = [
+            [file_paths[i] for i in pending[start:start + READ_CHUNK_SIZE]]
+            for start in range(0, len(pending), READ_CHUNK_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            read = [result for chunk in pool.map(_read_chunk, chunks, [max_bytes] * len(chunks)) for result in chunk]
+        for i, result in zip(pending, read):
+            results[i] = result
+    else:
+        for i in pending:
+            results[i] = read_text_file(file_paths[i], max_bytes)
+
+    if cache:
+        for i in pending:
+            content, reason = results[i]
+            if _cacheable(content, reason):
+                cache.store(file_paths[i], stats[i], content, reason)
+    return results
+
+
+def iter_read_files(file_paths, cache=None, workers=1, max_bytes=None):
+    """Like read_files, but yield (content, skip_reason) pairs lazily, in order.
+
+    Paths are read in batches of workers * READ_CHUNK_SIZE, so only one
+    batch of contents is held at a time and a consumer that stops early
+    never reads the remaining files.
+    """
+    batch = max(workers, 1) * READ_CHUNK_SIZE
+    for start in range(0, len(file_paths), batch):
+        yield from read_files(file_paths[start:start + batch], cache, workers, max_bytes)
@@ -0,0 +1,101 @@
+import os
+import time
+import hashlib
+import sqlite3
+
+CACHE_DIR = os.path.expanduser("~/.llm_code_cache/context")
+SCHEMA_VERSION = "2"
+
+# Files modified this recently may still change within the same mtime tick,
+# so their content is never cached (same idea as git's "racily clean" check).
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+def cache_path_for(root):
+    """Return the cache database path for a workspace root."""
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{digest}.sqlite3")
+
+
+class WorkspaceCache:
+    """On-disk cache of decoded workspace files, keyed by path and stat data.
+
+    An entry is reused only while size, mtime_ns and inode all still match.
+    Skipped (binary) files are cached too, with content None and the skip
+    reason, so they are not reopened on every refresh. Changing the ignore
+    rules drops the cache.
+    """
+
+    def __init__(self, root, ignore_digest=""):
+        self.root = os.path.abspath(root)
+        self.db_path = cache_path_for(self.root)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        if meta.get("version") != SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS files")
+        self._create_files_table()
+        if meta.get("version") != SCHEMA_VERSION or meta.get("ignore_digest") != ignore_digest:
+            self.conn.execute("DELETE FROM files")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("version", SCHEMA_VERSION), ("ignore_digest", ignore_digest), ("root", self.root)]
+            )
+            self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _create_files_table(self):
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "ino INTEGER, content TEXT, skipped TEXT)"
+        )
+
+    def lookup(self, path, st):
+        """Return the cached (content, skip_reason) for a file, or None if its stat changed."""
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, ino, content, skipped FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if row and row[:3] == (st.st_size, st.st_mtime_ns, st.st_ino):
+            self.hits += 1
+            return row[3], row[4]
+        self.misses += 1
+        return None
+
+    def store(self, path, st, content, skipped=None):
+        """Record the decoded content, or None and the reason the file was skipped."""
+        if time.time_ns() - st.st_mtime_ns < RACY_WINDOW_NS:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, ino, content, skipped) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, st.st_ino, content, skipped)
+        )
+
+    def prune(self, under, seen):
+        """Forget cached files below `under` that were not seen in this walk."""
+        prefix = os.path.join(os.path.abspath(under), "")
+        stale = [
+            (path,) for (path,) in self.conn.execute("SELECT path FROM files")
+            if path.startswith(prefix) and path not in seen
+        ]
+        self.conn.executemany("DELETE FROM files WHERE path = ?", stale)
+
+    def close(self):
+        try:
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+
+def open_workspace_cache(root, ignore_text=""):
+    """Open the cache for `root`, or return None if it cannot be used."""
+    digest = hashlib.sha1(ignore_text.encode("utf-8")).hexdigest()
+    try:
+        return WorkspaceCache(root, digest)
+    except (sqlite3.Error, OSError):
+        return None